@@ -0,0 +1,33 @@
+import csv
+import json
+import pandas as pd
+from modules.batch import run_tender_batch
+
+def test_batch_generates_one_workbook_per_tender(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+    ])
+    manifest = tmp_path / 'tenders.json'
+    manifest.write_text(json.dumps([
+        {'tender_id': 'T/1', 'requirements': 'security camera', 'margin': 10},
+        {'tender_id': 'T/1', 'requirements': 'door sensor', 'margin': 20},
+        {'tender_id': 'T-3', 'requirements': 'drone', 'margin': 5},
+    ]))
+    output_dir = tmp_path / 'out'
+
+    summaries = run_tender_batch(str(manifest), db_path, str(output_dir), workers=2, run_id='run1')
+
+    run_dir = output_dir / 'run1'
+    assert [s['output_file'] for s in summaries] == [
+        str(run_dir / 'Tender_T_1.xlsx'), str(run_dir / 'Tender_T_1_2.xlsx'), '']
+    assert summaries[2]['error'] == "No items matched the requirements."
+    assert pd.read_excel(summaries[1]['output_file'])['Item Name'].tolist() == ['Door Sensor']
+    with open(run_dir / 'summary.csv', newline='') as f:
+        assert [row['items'] for row in csv.DictReader(f)] == ['1', '1', '0']
+
+    # Runs into the same folder never share files
+    first, second = (run_tender_batch(str(manifest), db_path, str(output_dir), workers=1) for _ in range(2))
+    assert first[0]['output_file'] != second[0]['output_file']
+    assert len(list(output_dir.glob('*/summary.csv'))) == 3
@@ -0,0 +1,29 @@
+import copy
+from collections import Counter
+from dbgen import generate_synthetic_catalog, generate_synthetic_tenders
+from modules.benchmark import STAGES, run_benchmarks, find_regressions
+
+def test_synthetic_catalog_is_reproducible_and_zipfian():
+    rows = generate_synthetic_catalog(2000, vocab_size=500, seed=7)
+    assert rows == generate_synthetic_catalog(2000, vocab_size=500, seed=7)
+    assert len({row[0] for row in rows}) == 2000 and all(row[3] > 0 for row in rows)
+    counts = Counter(word for row in rows for word in row[2].split())
+    (_, top), = counts.most_common(1)
+    assert top > 20 * sorted(counts.values())[len(counts) // 2]
+    tenders = generate_synthetic_tenders(10, vocab_size=500, seed=7)
+    assert all(set(t['requirements'].split()) <= set(counts) | {w for row in rows for w in row[1].lower().split()}
+               for t in tenders)
+
+def test_benchmark_report_and_regression_flags(tmp_path):
+    report = run_benchmarks(sizes=[300], queries=5, pricing_repeats=2, isolate=False, workdir=str(tmp_path))
+    metrics = report['results']['300']
+    assert set(metrics) == set(STAGES)
+    assert metrics['load']['rows_per_second'] > 0 and metrics['generate']['rows'] == 300
+    assert metrics['recommend']['calls'] == 5 and metrics['recommend']['p50_ms'] <= metrics['recommend']['p99_ms']
+    assert find_regressions(report, report) == []
+
+    baseline = copy.deepcopy(report)
+    baseline['results']['300']['load']['rows_per_second'] *= 2
+    baseline['results']['300']['pricing']['p95_ms'] = metrics['pricing']['p95_ms'] / 2
+    flagged = find_regressions(report, baseline)
+    assert len(flagged) == 2 and flagged[0].startswith('load @ 300 items: rows_per_second')
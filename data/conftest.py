@@ -0,0 +1,18 @@
+import sqlite3
+import pytest
+
+@pytest.fixture
+def make_catalog():
+    """
+    Returns a function that writes a catalog database in the original 'items_master' layout (no primary key or
+    sync columns), as the first versions of dbgen and the loader created it, so every test also covers the
+    schema migration. Items are (item_name, description, cost_price) or (..., category) tuples.
+    """
+    def make(db_path, items):
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE items_master (item_name TEXT, description TEXT, cost_price REAL, category TEXT)')
+        conn.executemany('INSERT INTO items_master (item_name, description, cost_price, category) VALUES (?, ?, ?, ?)',
+                         [tuple(item) + (None,) * (4 - len(item)) for item in items])
+        conn.commit()
+        conn.close()
+    return make
@@ -0,0 +1,55 @@
+import sqlite3
+from modules.fuzzy import TrigramIndex, edit_distance, load_term_index
+from modules.matcher import recommend_items_for_tender
+
+def test_trigram_expansion_and_edit_distance():
+    index = TrigramIndex()
+    index.update({'surveillance': 3, 'floodlight': 2, 'camera': 5, 'cameras': 1, 'sensor': 4})
+    assert index.expand('survelliance') == ['surveillance']
+    assert index.expand('floodlite') == ['floodlight']
+    assert index.expand('cmaera') == ['camera']
+    assert index.expand('sensor') == [] and index.expand('cam') == [] and index.expand('x100') == []
+    assert index.update({'camera': 5, 'sensors': 1}) == (1, 4)
+    assert index.expand('sensros') == ['sensors'] and index.expand('floodlite') == []
+    assert edit_distance('kitten', 'sitting', 3) == 3 and edit_distance('kitten', 'sitting', 1) == 2
+
+def test_fuzzy_matching_follows_catalog_changes(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision surveillance camera', 120.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+    ])
+    assert recommend_items_for_tender(db_path, 'survelliance floodlite', 10) == []
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'survelliance floodlite', 10, fuzzy=True)}
+    assert names == {'Security Camera'}
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO items_master (item_name, description, cost_price) VALUES ('Floodlight', 'Outdoor', 65.0)")
+    conn.commit()
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'survelliance floodlite', 10, fuzzy=True)}
+    assert names == {'Security Camera', 'Floodlight'}
+    assert 'floodlight' in load_term_index(db_path, conn)
+    conn.close()
+
+def test_term_index_is_only_refreshed_when_catalog_text_changes(tmp_path, make_catalog, monkeypatch):
+    import modules.fuzzy
+    from modules.storage import open_catalog
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [('Security Camera', 'HD surveillance camera', 120.0)])
+    reads, read_vocabulary = [], modules.fuzzy.read_vocabulary
+    monkeypatch.setattr(modules.fuzzy, 'read_vocabulary', lambda conn: reads.append(1) or read_vocabulary(conn))
+    conn = open_catalog(db_path)
+    index = load_term_index(db_path, conn)
+    assert 'surveillance' in index and len(reads) == 1
+
+    # Price and status changes, and rewrites of the same text, leave the vocabulary alone
+    conn.execute("UPDATE items_master SET cost_price = 99.0, is_active = 0")
+    conn.execute("UPDATE items_master SET item_name = item_name, description = description")
+    conn.commit()
+    assert load_term_index(db_path, conn) is index and len(reads) == 1
+
+    conn.execute("UPDATE items_master SET description = 'HD floodlight camera'")
+    conn.commit()
+    load_term_index(db_path, conn)
+    assert len(reads) == 2 and 'floodlight' in index and 'surveillance' not in index
+    conn.close()
@@ -0,0 +1,143 @@
+import csv
+import sqlite3
+from openpyxl import Workbook
+from modules.loader import load_excel_with_column_mapping
+
+def write_price_list(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Item Name', 'Description', 'Cost Price'])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+def test_streaming_load_with_reject_report(tmp_path):
+    excel_file = str(tmp_path / 'prices.xlsx')
+    db_path = str(tmp_path / 'items.db')
+    report = str(tmp_path / 'rejects.csv')
+    write_price_list(excel_file, [
+        ('Security Camera', 'HD camera', 120.0),
+        ('Broken', 'No price', None),
+        ('Door Sensor', 'Wireless sensor', '18.75'),
+        ('Freebie', 'Zero cost', 0),
+        ('Alarm Panel', None, 200),
+    ])
+
+    summary = load_excel_with_column_mapping(excel_file, db_path, chunk_size=2, reject_report=report)
+
+    assert summary == {'inserted': 3, 'updated': 0, 'unchanged': 0, 'removed': 0, 'rejected': 2,
+                       'rejected_rows': [3, 5]}
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT item_name, description, cost_price FROM items_master ORDER BY id').fetchall()
+    conn.close()
+    assert rows == [('Security Camera', 'HD camera', 120.0), ('Door Sensor', 'Wireless sensor', 18.75),
+                    ('Alarm Panel', None, 200.0)]
+    with open(report, newline='') as f:
+        assert [r[0] for r in csv.reader(f)] == ['Row', '3', '5']
+
+def test_sync_skips_unchanged_and_soft_deletes(tmp_path):
+    from modules.loader import sync_excel_catalog
+    from modules.matcher import recommend_items_for_tender
+    excel_file = str(tmp_path / 'prices.xlsx')
+    db_path = str(tmp_path / 'items.db')
+    write_price_list(excel_file, [
+        ('Security Camera', 'HD camera', 120.0),
+        ('Door Sensor', 'Wireless sensor', 18.75),
+        ('Alarm Panel', 'Control panel', 200.0),
+    ])
+    first = sync_excel_catalog(excel_file, db_path)
+    assert (first['inserted'], first['updated'], first['unchanged'], first['removed']) == (3, 0, 0, 0)
+    assert sync_excel_catalog(excel_file, db_path)['unchanged'] == 3
+
+    write_price_list(excel_file, [
+        ('security  camera', 'HD camera', 99.0),
+        ('Door Sensor', 'Wireless sensor', 18.75),
+        ('Floodlight', 'Outdoor floodlight', 65.0),
+    ])
+    second = sync_excel_catalog(excel_file, db_path, soft_delete=True)
+    assert (second['inserted'], second['updated'], second['unchanged'], second['removed']) == (1, 1, 1, 1)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM items_master').fetchone()[0] == 4
+    conn.close()
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'camera panel floodlight', 10)}
+    assert names == {'security  camera', 'Floodlight'}
+
+def test_ingest_directory_uses_profiles_and_single_writer(tmp_path):
+    from modules.ingest import ingest_directory, save_mapping_profile
+    suppliers = tmp_path / 'suppliers'
+    suppliers.mkdir()
+    db_path = str(tmp_path / 'items.db')
+    profiles = str(tmp_path / 'profiles.json')
+    write_price_list(str(suppliers / 'a.xlsx'), [('Security Camera', 'HD camera', 120.0), ('Bad', 'x', -1)])
+    (suppliers / 'b.csv').write_text('SKU,Product,Details,Unit Cost\nDS-1,Door Sensor,Wireless,18.75\n')
+    (suppliers / 'c.csv').write_text('Foo,Bar\n1,2\n')
+    save_mapping_profile(profiles, ['SKU', 'Product', 'Details', 'Unit Cost'], {
+        'Item Key': 'SKU', 'Item Name': 'Product', 'Description': 'Details', 'Cost Price': 'Unit Cost'})
+
+    report = ingest_directory(str(suppliers), db_path, profiles_path=profiles, workers=2, chunk_size=1)
+
+    assert report['totals'] == {'files': 3, 'failed': 1, 'inserted': 2, 'updated': 0, 'unchanged': 0, 'rejected': 1}
+    assert ingest_directory(str(suppliers), db_path, profiles_path=profiles, workers=2)['totals']['unchanged'] == 2
+    conn = sqlite3.connect(db_path)
+    assert sorted(conn.execute('SELECT item_key FROM items_master')) == [('ds-1',), ('security camera',)]
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+
+def test_ingest_directory_applies_files_in_path_order(tmp_path):
+    from modules.ingest import ingest_directory
+    suppliers = tmp_path / 'suppliers'
+    suppliers.mkdir()
+    db_path = str(tmp_path / 'items.db')
+    # The first file takes longest to parse, so its batches reach the writer last
+    filler = ''.join(f'Filler {i},Spare part,{i + 1}\n' for i in range(2000))
+    (suppliers / 'a.csv').write_text('Item Name,Description,Cost Price\n' + filler + 'Door Sensor,Wireless,3009\n')
+    (suppliers / 'b.csv').write_text('Item Name,Description,Cost Price\nDoor Sensor,Wireless,3050\n')
+    (suppliers / 'c.csv').write_text('Item Name,Description,Cost Price\nDoor Sensor,Wireless,3098\n')
+
+    ingest_directory(str(suppliers), db_path, profiles_path=str(tmp_path / 'profiles.json'), workers=3,
+                     chunk_size=10)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT cost_price FROM items_master WHERE item_key = 'door sensor'").fetchone() == (3098,)
+    conn.close()
+
+def test_ingest_directory_blocks_parsers_ahead_of_the_writer(tmp_path, monkeypatch):
+    import modules.ingest
+    from modules.ingest import ingest_directory
+    # With one batch per file queue, parsers of later files wait for the writer instead of buffering
+    monkeypatch.setattr(modules.ingest, 'QUEUE_SIZE', 1)
+    suppliers = tmp_path / 'suppliers'
+    suppliers.mkdir()
+    db_path = str(tmp_path / 'items.db')
+    for name, price in (('a', 10), ('b', 20), ('c', 30)):
+        rows = ''.join(f'Part {name}{i},Spare part,{i + 1}\n' for i in range(200))
+        (suppliers / f'{name}.csv').write_text('Item Name,Description,Cost Price\n' + rows +
+                                               f'Door Sensor,Wireless,{price}\n')
+
+    report = ingest_directory(str(suppliers), db_path, profiles_path=str(tmp_path / 'profiles.json'), workers=3,
+                              chunk_size=10)
+    assert report['totals']['inserted'] == 601 and report['totals']['updated'] == 2
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT cost_price FROM items_master WHERE item_key = 'door sensor'").fetchone() == (30,)
+    conn.close()
+
+def test_sync_keeps_suppliers_apart(tmp_path, make_catalog):
+    from modules.loader import sync_excel_catalog
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [('Door Sensor', 'House brand sensor', 15.0)])
+    supplier_a, supplier_b = str(tmp_path / 'supplier_a.xlsx'), str(tmp_path / 'supplier_b.xlsx')
+    write_price_list(supplier_a, [('Door Sensor', 'Wireless sensor', 18.75), ('Security Camera', 'HD camera', 120.0)])
+    write_price_list(supplier_b, [('Door Sensor', 'Wired sensor', 21.0)])
+
+    assert sync_excel_catalog(supplier_a, db_path, soft_delete=True)['removed'] == 0
+    assert sync_excel_catalog(supplier_b, db_path, soft_delete=True)['removed'] == 0
+    query = "SELECT source, cost_price FROM items_master WHERE item_name = 'Door Sensor' AND is_active = 1 ORDER BY id"
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(query).fetchall() == [(None, 15.0), ('supplier_a', 18.75), ('supplier_b', 21.0)]
+
+    # Dropping an item from one supplier's list only deactivates that supplier's row
+    write_price_list(supplier_a, [('Security Camera', 'HD camera', 120.0)])
+    summary = sync_excel_catalog(supplier_a, db_path, soft_delete=True)
+    assert (summary['unchanged'], summary['removed']) == (1, 1)
+    assert conn.execute(query).fetchall() == [(None, 15.0), ('supplier_b', 21.0)]
+    conn.close()
@@ -0,0 +1,182 @@
+import sqlite3
+from modules.matcher import recommend_items_for_tender
+
+def test_index_lookup_and_maintenance(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+        ('Alarm Panel', 'Touchscreen alarm control panel', 200.0),
+    ])
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'Camera, sensor!', 10)}
+    assert names == {'Security Camera', 'Door Sensor'}
+
+    # Rows written after the index exists are picked up by its triggers
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO items_master (item_name, description, cost_price) VALUES ('PTZ Camera', 'Pan tilt zoom dome', 300.0)")
+    conn.execute("DELETE FROM items_master WHERE item_name = 'Door Sensor'")
+    conn.commit()
+    conn.close()
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'camera sensor', 10)}
+    assert names == {'Security Camera', 'PTZ Camera'}
+
+def test_ranked_top_k_and_pagination(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Alarm Panel', 'Touchscreen security alarm control panel', 900.0),
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Floodlight', 'Outdoor security floodlight', 65.0),
+        ('Door Sensor', 'Wireless door sensor', -5.0),
+    ])
+    ranked = recommend_items_for_tender(db_path, 'security camera', 10)
+    assert [i['item_name'] for i in ranked][0] == 'Security Camera'
+    assert len(ranked) == 3
+    assert ranked == sorted(ranked, key=lambda i: i['match_score'], reverse=True)
+
+    page = recommend_items_for_tender(db_path, 'security camera', 10, top_k=1, offset=1)
+    assert [i['item_name'] for i in page] == [ranked[1]['item_name']]
+    blended = recommend_items_for_tender(db_path, 'security camera', 10, top_k=1, profit_weight=100)
+    assert blended[0]['item_name'] == 'Alarm Panel'
+
+def test_semantic_mode_updates_embeddings_incrementally(tmp_path, make_catalog):
+    from modules.embeddings import update_embedding_store, load_embedding_store
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Alarm Panel', 'Touchscreen alarm control panel', 200.0),
+    ])
+    assert update_embedding_store(db_path) == 2
+    ranked = recommend_items_for_tender(db_path, 'night vision cameras', 10, mode='semantic', top_k=1)
+    assert [i['item_name'] for i in ranked] == ['Security Camera']
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO items_master (item_name, description, cost_price) VALUES ('Door Sensor', 'Wireless door entry sensor', 18.75)")
+    conn.commit()
+    conn.close()
+    assert update_embedding_store(db_path) == 1
+    assert update_embedding_store(db_path) == 0
+    vectors, rowids, _, _ = load_embedding_store(db_path)
+    assert vectors.shape[0] == 3 and list(rowids) == [1, 2, 3]
+    ranked = recommend_items_for_tender(db_path, 'door sensors', 10, mode='semantic', top_k=1)
+    assert ranked[0]['item_name'] == 'Door Sensor'
+
+def test_semantic_mode_uses_the_store_backend_unless_another_is_asked_for(tmp_path, make_catalog, monkeypatch):
+    import modules.embeddings
+    from modules.embeddings import HashedTfidfEncoder, update_embedding_store
+
+    class WideEncoder(HashedTfidfEncoder):
+        name = 'wide-hashed-tfidf'
+
+        def __init__(self):
+            super().__init__(dim=1024)
+
+    monkeypatch.setitem(modules.embeddings.ENCODERS, WideEncoder.name, WideEncoder)
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Alarm Panel', 'Touchscreen alarm control panel', 200.0),
+    ])
+    update_embedding_store(db_path, WideEncoder.name)
+    ranked = recommend_items_for_tender(db_path, 'night vision cameras', 10, mode='semantic', top_k=1)
+    assert [i['item_name'] for i in ranked] == ['Security Camera']
+    asked = recommend_items_for_tender(db_path, 'night vision cameras', 10, mode='semantic',
+                                       embedding_backend=WideEncoder.name)
+    assert [i['item_name'] for i in asked][0] == 'Security Camera'
+    error = recommend_items_for_tender(db_path, 'night vision cameras', 10, mode='semantic',
+                                       embedding_backend='hashed-tfidf')
+    assert isinstance(error, str) and "built with 'wide-hashed-tfidf'" in error
+
+def test_embedding_store_updates_are_serialised_and_never_run_on_queries(tmp_path, make_catalog):
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    from modules.embeddings import embedding_store_path, update_embedding_store, load_embedding_store
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [(f'Camera {i}', f'Dome camera model {i}', 10.0 + i) for i in range(3000)])
+    ranked = recommend_items_for_tender(db_path, 'dome camera', 10, mode='semantic')
+    assert isinstance(ranked, str) and 'No embedding store' in ranked
+    assert not os.path.exists(embedding_store_path(db_path))
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        added = list(pool.map(lambda _: update_embedding_store(db_path, batch_size=256), range(6)))
+    assert sorted(added) == [0, 0, 0, 0, 0, 3000]
+    vectors, rowids, _, meta = load_embedding_store(db_path)
+    assert meta['count'] == meta['last_rowid'] == vectors.shape[0] == 3000
+    assert list(rowids) == list(range(1, 3001))
+    assert os.path.getsize(os.path.join(embedding_store_path(db_path), 'rowids.i64')) == 3000 * 8
+
+def test_match_cache_reuses_matches_until_catalog_changes(tmp_path, make_catalog):
+    from modules.matcher import match_cache_info
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [('Security Camera', 'HD night vision security camera', 100.0)])
+    first = recommend_items_for_tender(db_path, 'security camera', 10)
+    hits = match_cache_info()['hits']
+    second = recommend_items_for_tender(db_path, 'Camera, SECURITY', 20)
+    assert match_cache_info()['hits'] == hits + 1
+    assert [round(i['suggested_selling_price'], 2) for i in (first + second)] == [110.0, 120.0]
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE items_master SET cost_price = 200.0")
+    conn.commit()
+    conn.close()
+    assert recommend_items_for_tender(db_path, 'security camera', 10)[0]['cost_price'] == 200.0
+
+def test_streamed_recommendations_write_constant_memory_workbook(tmp_path, make_catalog):
+    import pandas as pd
+    from itertools import chain
+    from modules.matcher import iter_recommended_items
+    from modules.generator import generate_tender_excel
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [(f'Camera {i}', 'security camera' + ' camera' * (i % 3), 10.0 + i) for i in range(7)])
+    chunks = list(iter_recommended_items(db_path, 'camera', 10, chunk_size=3))
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    streamed = [item['item_name'] for item in chain.from_iterable(chunks)]
+    assert streamed == [item['item_name'] for item in recommend_items_for_tender(db_path, 'camera', 10)]
+
+    output_file = str(tmp_path / 'tender.xlsx')
+    written = generate_tender_excel(chain.from_iterable(iter_recommended_items(db_path, 'camera', 10, chunk_size=2)),
+                                    output_file)
+    assert written == 7
+    assert pd.read_excel(output_file)['Item Name'].tolist() == streamed
+
+def test_snapshot_mode_matches_substrings_and_rebuilds_after_sync(tmp_path, make_catalog):
+    import os
+    from openpyxl import Workbook
+    from modules.loader import sync_excel_catalog
+    from modules.snapshot import load_catalog_snapshot, refresh_catalog_snapshot, snapshot_path
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+        ('Café Sign', 'Illuminated CAFÉ sign', 40.0),
+    ])
+    # Queries only map an existing snapshot, they never build one
+    error = recommend_items_for_tender(db_path, 'door', 10, mode='snapshot')
+    assert isinstance(error, str) and 'No catalog snapshot' in error
+    assert not os.path.exists(snapshot_path(db_path))
+
+    refresh_catalog_snapshot(db_path, create=True)
+    ranked = recommend_items_for_tender(db_path, 'cameras door', 10, mode='snapshot')
+    assert [i['item_name'] for i in ranked] == ['Door Sensor']
+    assert [i['item_name'] for i in recommend_items_for_tender(db_path, 'café', 10, mode='snapshot')] == ['Café Sign']
+    snapshot = load_catalog_snapshot(db_path)
+    assert len(snapshot) == 3 and snapshot.text('description', 2) == 'Illuminated CAFÉ sign'
+
+    # A write behind the loader's back leaves the snapshot stale rather than rebuilding it on the query path
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE items_master SET cost_price = 20.0 WHERE item_name = 'Door Sensor'")
+    conn.commit()
+    conn.close()
+    error = recommend_items_for_tender(db_path, 'door', 10, mode='snapshot')
+    assert isinstance(error, str) and 'stale' in error
+    assert sorted(os.listdir(snapshot_path(db_path))) == ['current.json', f'v{snapshot.version}']
+
+    # A catalog sync through the loader rebuilds the snapshot
+    excel_file = str(tmp_path / 'prices.xlsx')
+    workbook = Workbook()
+    workbook.active.append(['Item Name', 'Description', 'Cost Price'])
+    workbook.active.append(['Dome Camera', 'Vandal-proof dome camera', 150.0])
+    workbook.save(excel_file)
+    sync_excel_catalog(excel_file, db_path)
+    assert load_catalog_snapshot(db_path).version > snapshot.version
+    names = [i['item_name'] for i in recommend_items_for_tender(db_path, 'camera', 10, mode='snapshot')]
+    assert names == ['Security Camera', 'Dome Camera']
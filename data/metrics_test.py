@@ -0,0 +1,65 @@
+from modules.matcher import recommend_items_for_tender
+from modules.generator import generate_tender_excel
+from modules.metrics import (enable_metrics, reset_metrics, metrics_snapshot, export_prometheus, stage_timer,
+                             profile_request)
+
+def test_stage_timers_and_counters(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Dome Camera', 'Indoor dome camera', 80.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+    ])
+
+    reset_metrics()
+    with stage_timer('match'):
+        pass
+    assert metrics_snapshot() == {'timers': {}, 'counters': {}}
+
+    enable_metrics()
+    try:
+        items = recommend_items_for_tender(db_path, 'camera', 10)
+        generate_tender_excel(items, str(tmp_path / 'tender.xlsx'))
+        snapshot = metrics_snapshot()
+        assert {'connect', 'query', 'match', 'price', 'write_xlsx'} <= set(snapshot['timers'])
+        assert snapshot['timers']['match']['count'] == 1
+        assert snapshot['counters'] == {'rows_scanned': 2, 'rows_matched': 2, 'rows_priced': 2, 'rows_written': 2}
+        text = export_prometheus()
+        assert 'tenderpilot_stage_seconds_count{stage="write_xlsx"} 1' in text
+        assert 'tenderpilot_rows_written_total 2' in text
+    finally:
+        enable_metrics(False)
+        reset_metrics()
+
+def test_profile_request_reports_hot_functions(tmp_path):
+    with profile_request('slow tender', output_dir=str(tmp_path)) as report:
+        sorted(str(i) for i in range(20000))
+    assert report['seconds'] > 0 and report['peak_memory_bytes'] > 0
+    assert '<genexpr>' in report['profile']
+    assert report['profile_file'].startswith(str(tmp_path / 'slow_tender-'))
+
+def test_concurrent_profiled_requests_keep_their_own_peaks():
+    import threading
+    import tracemalloc
+    from concurrent.futures import ThreadPoolExecutor
+    big_started = threading.Event()
+
+    def big():
+        with profile_request('big') as report:
+            big_started.set()
+            held = [bytes(1024) for _ in range(20000)]
+            threading.Event().wait(0.2)
+            del held
+        return report
+
+    def small():
+        big_started.wait(10)
+        with profile_request('small') as report:
+            sorted(str(i) for i in range(100))
+        return report
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        big_report, small_report = [f.result() for f in (pool.submit(big), pool.submit(small))]
+    assert big_report['peak_memory_bytes'] > 20000 * 1024
+    assert small_report['peak_memory_bytes'] < 20000 * 1024 / 4
+    assert not tracemalloc.is_tracing()
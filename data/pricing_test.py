@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from modules.pricing import price_matrix, price_grid
+from modules.generator import generate_tender_excel
+
+def test_price_matrix_masks_invalid_costs():
+    prices, valid = price_matrix([100.0, 0, None, 'n/a', '50'], [10, 20])
+    assert valid.tolist() == [True, False, False, False, True]
+    np.testing.assert_allclose(prices[valid], [[110.0, 120.0], [55.0, 60.0]])
+    assert np.isnan(prices[~valid]).all()
+
+def test_what_if_grid_and_workbook_columns(tmp_path):
+    items = [
+        {'item_name': 'Camera', 'description': 'HD', 'cost_price': 100.0,
+         'suggested_selling_price': 115.0, 'profit_margin_percent': 15},
+        {'item_name': 'Broken', 'description': '', 'cost_price': -1.0,
+         'suggested_selling_price': 0.0, 'profit_margin_percent': 15},
+    ]
+    grid = price_grid(items, [5, 12.5])
+    assert list(grid.columns) == ['Item Name', 'Description', 'Cost Price', 'Price @ 5%', 'Price @ 12.5%']
+    assert grid['Price @ 12.5%'].tolist() == [112.5]
+
+    output_file = str(tmp_path / 'tender.xlsx')
+    generate_tender_excel(items[:1], output_file, what_if_margins=[5, 40])
+    df = pd.read_excel(output_file)
+    assert df['Price @ 40%'].tolist() == [140.0]
+
+def test_pricing_rules_are_applied_in_bulk():
+    from modules.pricing import compile_pricing_rules, apply_pricing_rules
+    rules = compile_pricing_rules([
+        ('cost_band', None, 0, 30),
+        ('cost_band', None, 100, 20),
+        ('category', 'Cameras', None, 50),
+        ('quantity_break', None, 10, 10),
+        ('rounding', None, None, 1),
+    ])
+    prices, margins, valid = apply_pricing_rules(
+        rules, [50, 150, 150, -1], 15, categories=['Sensors', None, ' cameras', 'Cameras'], quantities=[1, 1, 10, 1])
+    assert valid.tolist() == [True, True, True, False]
+    assert margins[:3].tolist() == [30, 20, 50]
+    assert prices[:3].tolist() == [65, 180, 203]
+
+def test_matcher_uses_stored_rules_until_they_change(tmp_path, make_catalog):
+    from modules.pricing import add_pricing_rule
+    from modules.matcher import recommend_items_for_tender
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [('Security Camera', 'HD camera', 100.0, 'Cameras')])
+    assert round(recommend_items_for_tender(db_path, 'camera', 10)[0]['suggested_selling_price'], 2) == 110.0
+    add_pricing_rule(db_path, 'category', 25, category='cameras')
+    add_pricing_rule(db_path, 'rounding', 10)
+    item = recommend_items_for_tender(db_path, 'camera', 10)[0]
+    assert (item['profit_margin_percent'], item['suggested_selling_price']) == (25, 130)
+    assert recommend_items_for_tender(db_path, 'camera', 10, use_pricing_rules=False)[0]['profit_margin_percent'] == 10
+
+def test_add_pricing_rule_opens_a_migrated_catalog(tmp_path, make_catalog):
+    import sqlite3
+    from modules.pricing import add_pricing_rule
+    from modules.storage import SCHEMA_VERSION
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [('Security Camera', 'HD camera', 100.0, 'Cameras')])
+    add_pricing_rule(db_path, 'cost_band', 15, min_value=50)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    rules = conn.execute('SELECT rule_type, min_value, value FROM pricing_rules').fetchall()
+    assert rules == [('cost_band', 50.0, 15.0)]
+    conn.close()
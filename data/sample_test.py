@@ -1,18 +1,16 @@
 import os
+import shutil
 import pandas as pd
 from modules.matcher import recommend_items_for_tender
 from modules.generator import generate_tender_excel
 
-def test_tender_excel_generation():
-    # Setup
-    db_path = os.path.join('db', 'items.db')
+def test_tender_excel_generation(tmp_path):
+    # Setup: a copy of the sample database, since opening it migrates the schema in place
+    db_path = str(tmp_path / 'items.db')
+    shutil.copyfile(os.path.join('db', 'items.db'), db_path)
     requirements = "security camera motion detector"
     profit_margin = 15
-    output_file = os.path.join('data', 'test_tender_output.xlsx')
-
-    # Remove output file if it exists
-    if os.path.exists(output_file):
-        os.remove(output_file)
+    output_file = str(tmp_path / 'test_tender_output.xlsx')
 
     # Run recommendation and generation
     recommended_items = recommend_items_for_tender(db_path, requirements, profit_margin)
@@ -29,4 +27,7 @@ def test_tender_excel_generation():
     print("Test passed: Excel file created with expected columns.")
 
 if __name__ == "__main__":
-    test_tender_excel_generation()
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_tender_excel_generation(Path(tmp_dir))
@@ -0,0 +1,96 @@
+import os
+import json
+import asyncio
+import urllib.request
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from modules.service import serve
+from modules.service_client import call_tender_service
+from modules.metrics import enable_metrics, reset_metrics
+from modules.embeddings import embedding_store_path, load_embedding_store
+
+@contextmanager
+def running_service(db_path, output_dir, pool_size=2):
+    """
+    Runs the tender service on a free port in a background event loop and yields its URL.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    servers = []
+
+    def on_ready(server):
+        servers.append(server)
+        started.set()
+
+    task = loop.create_task(serve(db_path, output_dir, port=0, pool_size=pool_size, ready=on_ready))
+
+    def run_until_cancelled():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run_until_cancelled, daemon=True)
+    thread.start()
+    try:
+        assert started.wait(30)
+        host, port = servers[0].sockets[0].getsockname()[:2]
+        yield f"http://{host}:{port}"
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(30)
+        enable_metrics(False)
+        reset_metrics()
+
+def test_service_recommends_prices_and_generates(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision security camera', 120.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+    ])
+
+    with running_service(db_path, str(tmp_path / 'out')) as url:
+        items = call_tender_service(url, '/recommend', {'requirements': 'door sensor', 'margin': 20})['items']
+        assert [i['item_name'] for i in items] == ['Door Sensor']
+        assert round(items[0]['suggested_selling_price'], 2) == 22.5
+        # The snapshot is built at start-up, so snapshot requests only map it
+        payload = {'requirements': 'door', 'margin': 20, 'mode': 'snapshot'}
+        assert [i['item_name'] for i in call_tender_service(url, '/recommend', payload)['items']] == ['Door Sensor']
+
+        prices = call_tender_service(url, '/price', {'cost_prices': [100, 0], 'margins': [10, 20]})['prices']
+        assert [round(p, 2) for p in prices[0]] == [110.0, 120.0] and prices[1] is None
+
+        result = call_tender_service(url, '/generate', {'requirements': 'camera', 'margin': 10, 'tender_id': 'T1'})
+        assert result['items'] == 1
+        assert pd.read_excel(result['output_file'])['Item Name'].tolist() == ['Security Camera']
+
+        with pytest.raises(RuntimeError, match='400'):
+            call_tender_service(url, '/recommend', {'requirements': ''})
+        with pytest.raises(RuntimeError, match='Profiling is disabled'):
+            call_tender_service(url, '/recommend', {'requirements': 'camera', 'margin': 10, 'profile': True})
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert json.loads(response.read())['timers']['match']['count'] >= 1
+
+def test_service_serves_concurrent_semantic_requests_from_a_store_built_at_start(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [(f'Camera {i}', f'Dome camera model {i}', 10.0 + i) for i in range(2000)] +
+                 [('Door Sensor', 'Wireless door/window entry sensor', 18.75)])
+
+    with running_service(db_path, str(tmp_path / 'out'), pool_size=4) as url:
+        built = [os.stat(os.path.join(embedding_store_path(db_path), name)).st_mtime_ns
+                 for name in ('meta.json', 'rowids.i64', 'vectors.f32')]
+        payload = {'requirements': 'wireless door sensor', 'margin': 10, 'mode': 'semantic', 'top_k': 1}
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda _: call_tender_service(url, '/recommend', payload), range(6)))
+        # Requests only read the store built at start-up
+        assert [os.stat(os.path.join(embedding_store_path(db_path), name)).st_mtime_ns
+                for name in ('meta.json', 'rowids.i64', 'vectors.f32')] == built
+    assert all([i['item_name'] for i in r['items']] == ['Door Sensor'] for r in results)
+    vectors, rowids, _, meta = load_embedding_store(db_path)
+    assert meta['count'] == vectors.shape[0] == 2001
+    assert list(rowids) == list(range(1, 2002))
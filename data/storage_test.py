@@ -0,0 +1,79 @@
+import sqlite3
+import pytest
+from modules.storage import SCHEMA_VERSION, open_catalog, schema_version
+from modules.matcher import recommend_items_for_tender
+
+def test_migrates_legacy_database(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision camera', 120.0), ('Door Sensor', 'Wireless entry sensor', 18.75)])
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE INDEX idx_items_master_item_name ON items_master(item_name)')
+    conn.execute('CREATE INDEX idx_items_master_description ON items_master(description)')
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT, description TEXT, '
+                 'cost_price REAL)')
+    conn.executemany('INSERT INTO items (item_name, description, cost_price) VALUES (?, ?, ?)', [
+        ('Door Sensor', 'Wireless entry sensor', 19.5), ('PTZ Camera', 'Pan tilt zoom camera', 300.0)])
+    conn.commit()
+    conn.close()
+
+    conn = open_catalog(db_path)
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    rows = conn.execute('SELECT id, item_key, item_name, cost_price FROM items_master ORDER BY id').fetchall()
+    assert rows == [(1, 'security camera', 'Security Camera', 120.0), (2, 'door sensor', 'Door Sensor', 19.5),
+                    (3, 'ptz camera', 'PTZ Camera', 300.0)]
+    objects = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+    assert 'items' not in objects
+    assert {'idx_items_master_item_name', 'idx_items_master_description'}.isdisjoint(objects)
+    assert {'idx_items_master_cost', 'idx_items_master_category_cost', 'items_master_fts_ai'} <= objects
+    plan = ' '.join(row[3] for row in conn.execute(
+        'EXPLAIN QUERY PLAN SELECT item_name FROM items_master WHERE category = ? AND cost_price > ?', ('x', 1)))
+    assert 'idx_items_master_category_cost' in plan
+    conn.close()
+
+    names = {i['item_name'] for i in recommend_items_for_tender(db_path, 'camera', 10)}
+    assert names == {'Security Camera', 'PTZ Camera'}
+
+def test_migration_soft_deletes_duplicate_rows_of_a_doubled_catalog(tmp_path, make_catalog):
+    from dbgen import SAMPLE_ITEMS
+    db_path = str(tmp_path / 'items.db')
+    # The original dbgen inserted the sample items on every run
+    make_catalog(db_path, SAMPLE_ITEMS * 2)
+
+    conn = open_catalog(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM items_master WHERE is_active = 1 AND item_key IS NULL').fetchone() == (0,)
+    active = conn.execute('SELECT id FROM items_master WHERE is_active = 1 ORDER BY id').fetchall()
+    assert [rowid for (rowid,) in active] == [1, 2, 3, 4, 5]
+    conn.close()
+
+    names = [i['item_name'] for i in recommend_items_for_tender(db_path, 'camera', 10)]
+    assert names == ['Security Camera']
+
+def test_rejects_custom_column_names(tmp_path):
+    from modules.loader import create_items_master_table
+    db_path = str(tmp_path / 'items.db')
+    with pytest.raises(ValueError):
+        create_items_master_table(db_path, {'item_name': 'product'})
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE items_master (product TEXT, details TEXT, price REAL)')
+    conn.close()
+    with pytest.raises(RuntimeError):
+        open_catalog(db_path)
+
+def test_adds_source_column_to_a_version_5_catalog(tmp_path):
+    db_path = str(tmp_path / 'items.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE items_master (id INTEGER PRIMARY KEY, item_key TEXT, item_name TEXT, description TEXT, '
+                 'cost_price REAL, category TEXT, content_hash TEXT, is_active INTEGER NOT NULL DEFAULT 1)')
+    conn.execute("INSERT INTO items_master (item_key, item_name, cost_price) "
+                 "VALUES ('door sensor', 'Door Sensor', 18.75)")
+    conn.execute('PRAGMA user_version = 5')
+    conn.commit()
+    conn.close()
+
+    conn = open_catalog(db_path)
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute('SELECT item_key, source FROM items_master').fetchall() == [('door sensor', None)]
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_items_master_source'").fetchone()
+    conn.close()
@@ -0,0 +1,68 @@
+import pandas as pd
+from modules.tender_lines import parse_line_items, load_line_items, line_item_rows
+from modules.matcher import recommend_line_items, recommend_items_for_tender
+from modules.generator import generate_tender_excel
+
+def test_parse_line_items():
+    lines = parse_line_items("50 x outdoor camera 4MP\n12 door sensor; 3. floodlight - qty: 4\nmatrix 3\n"
+                             "alarm panel - 2 nos\n0 x nothing\n\n4MP camera")
+    assert [(l['requirements'], l['quantity']) for l in lines] == [
+        ('outdoor camera 4MP', 50), ('door sensor', 12), ('floodlight', 4), ('matrix 3', 1), ('alarm panel', 2),
+        ('4MP camera', 1)]
+    assert [l['line'] for l in lines] == [1, 2, 3, 4, 5, 6]
+
+    # Specification numbers are only quantities with an explicit marker
+    lines = parse_line_items("2 MP camera\n3.5 inch display\n8 channel NVR\n10 mm cable\n2 x 2 MP camera\n"
+                             "3.5 m cable - qty: 4\n6 inch x 2")
+    assert [(l['requirements'], l['quantity']) for l in lines] == [
+        ('2 MP camera', 1), ('3.5 inch display', 1), ('8 channel NVR', 1), ('10 mm cable', 1), ('2 MP camera', 2),
+        ('3.5 m cable', 4), ('6 inch', 2)]
+
+def test_load_line_items_from_sheet(tmp_path):
+    sheet = tmp_path / 'tender.csv'
+    sheet.write_text('Sl,Item Description,Quantity\n1,Outdoor camera,50\n2,,3\n3,Door sensor,\n4,Alarm panel,-1\n')
+    lines = load_line_items(str(sheet))
+    assert lines == [{'line': 2, 'requirements': 'Outdoor camera', 'quantity': 50},
+                     {'line': 4, 'requirements': 'Door sensor', 'quantity': 1}]
+
+def test_batched_line_matching_and_workbook(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Security Camera', 'HD night vision outdoor camera', 120.0),
+        ('Dome Camera', 'Indoor dome camera', 80.0),
+        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
+        ('Floodlight', 'Outdoor security floodlight', 65.0),
+    ])
+    lines = parse_line_items('50 x outdoor camera\n12 x door sensor\n2 x teleporter')
+    recommended = recommend_line_items(db_path, lines, 10, top_k=2, use_pricing_rules=False)
+
+    cameras = recommended[0]['items']
+    assert [i['item_name'] for i in cameras] == ['Security Camera', 'Dome Camera']
+    assert [i['item_name'] for i in recommended[1]['items']] == ['Door Sensor']
+    assert recommended[2]['items'] == []
+    # Within a line the ranking agrees with matching the line on its own
+    single = recommend_items_for_tender(db_path, 'outdoor camera', 10, use_pricing_rules=False)
+    assert single[0]['item_name'] == 'Security Camera'
+
+    output = str(tmp_path / 'tender.xlsx')
+    assert generate_tender_excel(line_item_rows(recommended), output) == 4
+    df = pd.read_excel(output)
+    assert list(df['Requirement'][:4]) == ['outdoor camera', 'outdoor camera', 'door sensor', 'teleporter']
+    assert round(df['Line Total'][0], 2) == round(120.0 * 1.1 * 50, 2)
+    assert df['Line'].iloc[-1] == 'Total (best option per line)'
+    assert round(df['Line Total'].iloc[-1], 2) == round(120.0 * 1.1 * 50 + 18.75 * 1.1 * 12, 2)
+
+def test_line_matching_follows_the_index_tokenizer(tmp_path, make_catalog):
+    db_path = str(tmp_path / 'items.db')
+    make_catalog(db_path, [
+        ('Door_Sensor', 'Magnetic contact', 18.75),
+        ('Caméra Dôme', 'Caméra intérieure', 80.0),
+        ('Alarm Panel', 'Touchscreen alarm control panel', 200.0),
+    ])
+    lines = parse_line_items('12 x sensor\n4 x camera dome\n2 x caméra\n1 x door_sensor')
+    recommended = recommend_line_items(db_path, lines, 10, top_k=2, use_pricing_rules=False)
+    assert [[i['item_name'] for i in line['items']] for line in recommended] == [
+        ['Door_Sensor'], ['Caméra Dôme'], ['Caméra Dôme'], ['Door_Sensor']]
+    # Line scores agree with keyword mode, which matches through the same index
+    single = recommend_items_for_tender(db_path, 'sensor', 10, use_pricing_rules=False)
+    assert [i['item_name'] for i in single] == ['Door_Sensor']
@@ -1,30 +1,173 @@
-import sqlite3
 import os
+import csv
+import json
+import logging
+import argparse
+import numpy as np
+from modules.catalog import make_item_key, upsert_catalog_rows
+from modules.storage import open_catalog
+from modules.embeddings import update_embedding_store
+from modules.snapshot import refresh_catalog_snapshot
+
+# Sample catalog written by initialize_db: (item_name, description, cost_price, category)
+SAMPLE_ITEMS = [
+    ('Security Camera', 'HD night vision security camera', 120.0, 'Cameras'),
+    ('Motion Detector', 'Infrared motion sensor for indoor/outdoor use', 45.5, 'Sensors'),
+    ('Alarm Panel', 'Touchscreen alarm control panel', 200.0, 'Alarms'),
+    ('Door Sensor', 'Wireless door/window entry sensor', 18.75, 'Sensors'),
+    ('Floodlight', 'Outdoor security floodlight with motion activation', 65.0, 'Lighting')
+]
+# Syllables used to build the synthetic vocabulary; words are 2-4 syllables long
+SYLLABLES = ['ka', 'ro', 'mi', 'te', 'lu', 'sa', 'vo', 'ne', 'di', 'pa', 'zu', 'fe', 'gi', 'ho', 'bra', 'tri',
+             'sen', 'cam', 'lon', 'dex', 'mor', 'vis', 'tal', 'quin']
+SYNTHETIC_CATEGORIES = 20
+# Rows upserted per transaction when writing a synthetic catalog
+WRITE_BATCH_SIZE = 10000
 
 def initialize_db():
     db_folder = 'db'
     db_path = os.path.join(db_folder, 'items.db')
     os.makedirs(db_folder, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = open_catalog(db_path)
     cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS items_master (
-            item_name TEXT,
-            description TEXT,
-            cost_price REAL
-        )
-    ''')
-    sample_items = [
-        ('Security Camera', 'HD night vision security camera', 120.0),
-        ('Motion Detector', 'Infrared motion sensor for indoor/outdoor use', 45.5),
-        ('Alarm Panel', 'Touchscreen alarm control panel', 200.0),
-        ('Door Sensor', 'Wireless door/window entry sensor', 18.75),
-        ('Floodlight', 'Outdoor security floodlight with motion activation', 65.0)
-    ]
-    cursor.executemany('INSERT INTO items_master (item_name, description, cost_price) VALUES (?, ?, ?)', sample_items)
+    # Upsert by item key so running the script again does not duplicate the sample items
+    upsert_catalog_rows(cursor, [(make_item_key(item[0]),) + item for item in SAMPLE_ITEMS])
     conn.commit()
     conn.close()
+    update_embedding_store(db_path)
+    refresh_catalog_snapshot(db_path)
     print(f"Database initialized at {db_path} with sample data.")
 
+def synthetic_vocabulary(vocab_size: int, seed: int = 0):
+    """
+    Returns vocab_size distinct pseudo-words built from SYLLABLES, in a fixed order for a given seed.
+    The first words are the most frequent ones under zipf_weights.
+    """
+    rng = np.random.default_rng(seed)
+    words, seen = [], set()
+    while len(words) < vocab_size:
+        word = ''.join(rng.choice(SYLLABLES, size=rng.integers(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def zipf_weights(count: int, exponent: float):
+    """
+    Returns normalised Zipf probabilities 1 / rank ** exponent for ranks 1..count.
+    """
+    weights = np.arange(1, count + 1, dtype=np.float64) ** -exponent
+    return weights / weights.sum()
+
+def generate_synthetic_catalog(size: int, vocab_size: int = 2000, zipf_exponent: float = 1.1, seed: int = 0):
+    """
+    Generates a reproducible synthetic catalog.
+
+    Purpose:
+        - Names (2-3 words) and descriptions (6-12 words) draw their words from a synthetic vocabulary with
+          Zipf-distributed frequencies, so a few terms match much of the catalog and most match little, as in
+          real price lists.
+        - Costs are log-normal (median about 100) and categories are Zipf-distributed too.
+
+    Args:
+        size (int): Number of items.
+        vocab_size (int, optional): Number of distinct words.
+        zipf_exponent (float, optional): Zipf exponent of the word frequencies (higher is more skewed).
+        seed (int, optional): Random seed; the same arguments always give the same catalog.
+
+    Returns:
+        list of tuple: (item_key, item_name, description, cost_price, category) rows, as upsert_catalog_rows takes.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(synthetic_vocabulary(vocab_size, seed))
+    weights = zipf_weights(vocab_size, zipf_exponent)
+    categories = np.array([f'Category {i + 1:02d}' for i in range(SYNTHETIC_CATEGORIES)])
+    name_lengths = rng.integers(2, 4, size=size)
+    description_lengths = rng.integers(6, 13, size=size)
+    words = vocabulary[rng.choice(vocab_size, size=int(name_lengths.sum() + description_lengths.sum()), p=weights)]
+    costs = np.round(rng.lognormal(mean=np.log(100), sigma=1.0, size=size), 2)
+    item_categories = categories[rng.choice(SYNTHETIC_CATEGORIES, size=size,
+                                            p=zipf_weights(SYNTHETIC_CATEGORIES, zipf_exponent))]
+    rows, position = [], 0
+    for i in range(size):
+        name_end = position + name_lengths[i]
+        description_end = name_end + description_lengths[i]
+        # A model number keeps names (and so item keys) unique
+        item_name = ' '.join(words[position:name_end]).title() + f' {i + 1:07d}'
+        description = ' '.join(words[name_end:description_end])
+        rows.append((f'syn-{i + 1}', item_name, description, float(costs[i]), str(item_categories[i])))
+        position = description_end
+    return rows
+
+def generate_synthetic_tenders(count: int, vocab_size: int = 2000, zipf_exponent: float = 1.1, seed: int = 0,
+                               min_keywords: int = 2, max_keywords: int = 5):
+    """
+    Generates reproducible synthetic tenders whose requirements use the vocabulary of generate_synthetic_catalog
+    (with the same vocab_size and seed) under the same Zipf distribution.
+    Returns a list of dicts with 'tender_id', 'requirements' and 'margin', the shape of a batch manifest.
+    """
+    rng = np.random.default_rng(seed + 1)
+    vocabulary = synthetic_vocabulary(vocab_size, seed)
+    weights = zipf_weights(vocab_size, zipf_exponent)
+    tenders = []
+    for i in range(count):
+        keywords = rng.choice(vocab_size, size=rng.integers(min_keywords, max_keywords + 1), p=weights)
+        tenders.append({
+            'tender_id': f'SYN-{i + 1:05d}',
+            'requirements': ' '.join(vocabulary[k] for k in keywords),
+            'margin': float(rng.integers(5, 41)),
+        })
+    return tenders
+
+def write_synthetic_catalog(sqlite_db: str, rows):
+    """
+    Writes synthetic catalog rows into the 'items_master' table of a database, creating it if needed.
+    Rows are upserted by item key, so writing the same catalog twice does not duplicate it.
+    Returns the number of rows inserted.
+    """
+    conn = open_catalog(sqlite_db)
+    try:
+        cursor = conn.cursor()
+        inserted = 0
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            inserted += upsert_catalog_rows(cursor, rows[start:start + WRITE_BATCH_SIZE])['inserted']
+        conn.commit()
+    finally:
+        conn.close()
+    return inserted
+
+def write_synthetic_price_list(path: str, rows):
+    """
+    Writes synthetic catalog rows as a supplier price list (CSV) with the loader's standard column names.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Item Name', 'Description', 'Cost Price', 'Category'])
+        writer.writerows(row[1:] for row in rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Initialise the sample database or generate a synthetic catalog.")
+    parser.add_argument('--synthetic', type=int, default=None, metavar='SIZE',
+                        help="Generate a synthetic catalog of SIZE items instead of the sample data")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="Database for the synthetic catalog")
+    parser.add_argument('--vocab-size', type=int, default=2000, help="Number of distinct synthetic words")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of the word frequencies")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--tenders', type=int, default=0, help="Also write this many synthetic tenders")
+    parser.add_argument('--tenders-file', default='synthetic_tenders.json', help="Manifest for the tenders")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.synthetic is None:
+        initialize_db()
+        return
+    rows = generate_synthetic_catalog(args.synthetic, args.vocab_size, args.zipf, args.seed)
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    inserted = write_synthetic_catalog(args.db, rows)
+    print(f"Synthetic catalog of {len(rows)} items written to {args.db} ({inserted} new).")
+    if args.tenders:
+        with open(args.tenders_file, 'w') as f:
+            json.dump(generate_synthetic_tenders(args.tenders, args.vocab_size, args.zipf, args.seed), f, indent=1)
+        print(f"{args.tenders} synthetic tenders written to {args.tenders_file}.")
+
 if __name__ == "__main__":
-    initialize_db()
+    main()
@@ -0,0 +1,169 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import uuid
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.matcher import MATCH_MODES, recommend_items_for_tender
+from modules.generator import generate_tender_excel
+
+SUMMARY_COLUMNS = ['tender_id', 'requirements', 'profit_margin_percent', 'items', 'total_cost', 'total_selling_price',
+                   'output_file', 'error']
+
+def load_tender_manifest(manifest_file: str):
+    """
+    Reads a batch manifest of tenders from a CSV file (header row required) or a JSON list of objects.
+    Each tender needs 'tender_id', 'requirements' and 'margin' (or 'profit_margin_percent'); 'top_k' is optional.
+    Returns a list of dicts with keys 'tender_id', 'requirements', 'profit_margin_percent' and 'top_k'.
+    Raises ValueError for missing fields or invalid margins.
+    """
+    if manifest_file.lower().endswith('.json'):
+        with open(manifest_file) as f:
+            entries = json.load(f)
+    else:
+        with open(manifest_file, newline='') as f:
+            entries = list(csv.DictReader(f))
+    tenders = []
+    for number, entry in enumerate(entries, start=1):
+        margin = entry.get('margin', entry.get('profit_margin_percent'))
+        if not entry.get('tender_id') or not entry.get('requirements') or margin in (None, ''):
+            raise ValueError(f"Manifest entry {number} needs tender_id, requirements and margin: {entry}")
+        try:
+            margin = float(margin)
+        except ValueError:
+            raise ValueError(f"Manifest entry {number} has an invalid margin: {margin}")
+        top_k = entry.get('top_k')
+        tenders.append({
+            'tender_id': str(entry['tender_id']),
+            'requirements': entry['requirements'],
+            'profit_margin_percent': margin,
+            'top_k': int(top_k) if top_k not in (None, '') else None,
+        })
+    return tenders
+
+def tender_output_paths(tender_ids, output_dir: str):
+    """
+    Returns one unique workbook path per tender id, e.g. 'Tender_ABC-12.xlsx'.
+    Ids are reduced to filename-safe characters and repeated ids get a numeric suffix.
+    """
+    paths, used = [], set()
+    for tender_id in tender_ids:
+        base = 'Tender_' + (re.sub(r'[^\w.-]+', '_', tender_id).strip('._') or 'unnamed')
+        name, suffix = base, 2
+        while name.lower() in used:
+            name, suffix = f"{base}_{suffix}", suffix + 1
+        used.add(name.lower())
+        paths.append(os.path.join(output_dir, name + '.xlsx'))
+    return paths
+
+def new_batch_run_id() -> str:
+    """
+    Returns a unique name for a batch run's output folder: its start time plus a random suffix,
+    e.g. '20240131-142502_3f9c2a1b'.
+    """
+    return f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def run_tender_batch(manifest_file: str, sqlite_db: str, output_dir: str, workers: int = None, mode: str = 'keyword',
+                     fuzzy: bool = False, run_id: str = None):
+    """
+    Generates one tender workbook per manifest entry.
+
+    Purpose:
+        - Matches every tender in this process, so the catalog connection, search index and match cache are
+          loaded once for the whole batch.
+        - Writes the workbooks in parallel across a process pool, each to its own file.
+        - Writes a summary report (summary.csv) next to the workbooks.
+        - Puts each run's workbooks and report in their own subfolder of output_dir, so concurrent batches
+          never overwrite each other's files.
+
+    Args:
+        manifest_file (str): CSV or JSON manifest (see load_tender_manifest).
+        sqlite_db (str): Path to the SQLite database file.
+        output_dir (str): Folder holding the run folders; created if missing.
+        workers (int, optional): Number of writer processes. Defaults to the number of CPUs.
+        mode (str, optional): Matching mode passed to recommend_items_for_tender.
+        fuzzy (bool, optional): Expand misspelt requirement keywords to their closest catalog terms.
+        run_id (str, optional): Name of the run folder. Defaults to a new unique one (see new_batch_run_id).
+
+    Returns:
+        list of dict: One summary row per tender (see SUMMARY_COLUMNS); 'error' is empty on success.
+    """
+    logger = logging.getLogger(__name__)
+    tenders = load_tender_manifest(manifest_file)
+    run_dir = os.path.join(output_dir, run_id or new_batch_run_id())
+    os.makedirs(output_dir, exist_ok=True)
+    # Fails if the folder exists, so a run never writes into another run's folder, even with an explicit run_id
+    os.makedirs(run_dir)
+    paths = tender_output_paths([t['tender_id'] for t in tenders], run_dir)
+    logger.info(f"Running batch of {len(tenders)} tenders into {run_dir}.")
+
+    summaries, jobs = [], []
+    for tender, path in zip(tenders, paths):
+        summary = {'tender_id': tender['tender_id'], 'requirements': tender['requirements'],
+                   'profit_margin_percent': tender['profit_margin_percent'], 'items': 0, 'total_cost': 0.0,
+                   'total_selling_price': 0.0, 'output_file': '', 'error': ''}
+        summaries.append(summary)
+        items = recommend_items_for_tender(sqlite_db, tender['requirements'], tender['profit_margin_percent'],
+                                           top_k=tender['top_k'], mode=mode, fuzzy=fuzzy)
+        if isinstance(items, str):
+            summary['error'] = items
+        elif not items:
+            summary['error'] = "No items matched the requirements."
+        else:
+            summary['items'] = len(items)
+            summary['total_cost'] = round(sum(i['cost_price'] for i in items), 2)
+            summary['total_selling_price'] = round(sum(i['suggested_selling_price'] for i in items), 2)
+            jobs.append((summary, items, path))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (summary, path, pool.submit(generate_tender_excel, items, path)) for summary, items, path in jobs
+            ]
+            for summary, path, future in futures:
+                try:
+                    written = future.result()
+                except Exception as e:
+                    written, summary['error'] = 0, f"Error generating tender Excel file: {e}"
+                if written:
+                    summary['output_file'] = path
+                elif not summary['error']:
+                    summary['error'] = "Tender workbook could not be written."
+
+    report_path = os.path.join(run_dir, 'summary.csv')
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    failed = sum(1 for s in summaries if s['error'])
+    logger.info(f"Batch finished: {len(summaries) - failed} tenders generated, {failed} failed. Report: {report_path}")
+    return summaries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate tender workbooks for every tender in a manifest.")
+    parser.add_argument('manifest', help="CSV or JSON manifest with tender_id, requirements and margin")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    parser.add_argument('--output-dir', default=os.path.join('data', 'tenders'),
+                        help="Folder for the workbooks; each run writes to its own subfolder")
+    parser.add_argument('--workers', type=int, default=None, help="Number of writer processes")
+    parser.add_argument('--mode', choices=MATCH_MODES, default='keyword', help="Matching mode")
+    parser.add_argument('--fuzzy', action='store_true', help="Correct misspelt requirement keywords")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    run_id = new_batch_run_id()
+    summaries = run_tender_batch(args.manifest, args.db, args.output_dir, workers=args.workers, mode=args.mode,
+                                 fuzzy=args.fuzzy, run_id=run_id)
+    for summary in summaries:
+        print(f"{summary['tender_id']}: {summary['error'] or summary['output_file']}")
+    print(f"Summary report: {os.path.join(args.output_dir, run_id, 'summary.csv')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dbgen import (generate_synthetic_catalog, generate_synthetic_tenders, write_synthetic_catalog,
+                   write_synthetic_price_list)
+
+STAGES = ('load', 'recommend', 'recommend_cached', 'pricing', 'generate')
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_QUERIES = 200
+DEFAULT_PRICING_REPEATS = 20
+# Margins priced side by side in the pricing stage
+WHAT_IF_MARGINS = [5, 10, 15, 20, 25, 30, 35, 40]
+# A metric more than this fraction worse than its baseline is flagged as a regression
+DEFAULT_THRESHOLD = 0.25
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def latency_summary(seconds):
+    """
+    Summarises per-call timings as throughput and p50/p95/p99/max latencies in milliseconds.
+    """
+    ms = np.asarray(seconds) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'calls': len(ms),
+        'calls_per_second': round(len(ms) / max(float(np.sum(seconds)), 1e-9), 1),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+def prepare_workdir(workdir: str, size: int, queries: int, vocab_size: int, zipf_exponent: float, seed: int):
+    """
+    Writes the synthetic inputs of one benchmark size: a catalog database, a price list and a tender manifest.
+    """
+    rows = generate_synthetic_catalog(size, vocab_size, zipf_exponent, seed)
+    write_synthetic_catalog(os.path.join(workdir, 'catalog.db'), rows)
+    write_synthetic_price_list(os.path.join(workdir, 'price_list.csv'), rows)
+    with open(os.path.join(workdir, 'tenders.json'), 'w') as f:
+        json.dump(generate_synthetic_tenders(queries, vocab_size, zipf_exponent, seed), f)
+
+def run_stage(stage: str, workdir: str, pricing_repeats: int = DEFAULT_PRICING_REPEATS):
+    """
+    Runs one benchmark stage against the inputs written by prepare_workdir.
+    Modules are imported here so that, run in a fresh process, the stage's peak RSS includes only what it loads.
+    Returns a dict of metrics: 'seconds' and a '..._per_second' throughput for bulk stages, latency percentiles
+    for per-call stages, and 'peak_rss_mb'.
+    """
+    db_path = os.path.join(workdir, 'catalog.db')
+    with open(os.path.join(workdir, 'tenders.json')) as f:
+        tenders = json.load(f)
+    if stage == 'load':
+        from modules.loader import load_excel_with_column_mapping
+        target = os.path.join(workdir, 'load.db')
+        if os.path.exists(target):
+            os.remove(target)
+        start = time.perf_counter()
+        summary = load_excel_with_column_mapping(os.path.join(workdir, 'price_list.csv'), target)
+        seconds = time.perf_counter() - start
+        metrics = {'seconds': round(seconds, 4), 'rows_per_second': round(summary['inserted'] / seconds, 1)}
+    elif stage in ('recommend', 'recommend_cached'):
+        from modules.matcher import recommend_items_for_tender, clear_match_cache
+        # Opens the shared connection and prepares the schema outside the timings
+        recommend_items_for_tender(db_path, tenders[0]['requirements'], tenders[0]['margin'], top_k=50)
+        if stage == 'recommend_cached':
+            for tender in tenders:
+                recommend_items_for_tender(db_path, tender['requirements'], tender['margin'], top_k=50)
+        timings = []
+        for tender in tenders:
+            if stage == 'recommend':
+                clear_match_cache()
+            start = time.perf_counter()
+            recommend_items_for_tender(db_path, tender['requirements'], tender['margin'], top_k=50)
+            timings.append(time.perf_counter() - start)
+        metrics = latency_summary(timings)
+    elif stage == 'pricing':
+        from modules.storage import open_catalog
+        from modules.pricing import price_matrix, compile_pricing_rules, apply_pricing_rules
+        conn = open_catalog(db_path, readonly=True)
+        costs, categories = map(list, zip(*conn.execute('SELECT cost_price, category FROM items_master')))
+        conn.close()
+        rules = compile_pricing_rules([
+            ('cost_band', None, 0, 30), ('cost_band', None, 100, 20), ('cost_band', None, 1000, 12),
+            ('category', 'Category 01', None, 18), ('rounding', None, None, 1),
+        ])
+        timings = []
+        for _ in range(pricing_repeats):
+            start = time.perf_counter()
+            price_matrix(costs, WHAT_IF_MARGINS)
+            apply_pricing_rules(rules, costs, 15, categories=categories)
+            timings.append(time.perf_counter() - start)
+        metrics = latency_summary(timings)
+        metrics['items_per_second'] = round(len(costs) * len(timings) / sum(timings), 1)
+    elif stage == 'generate':
+        from modules.storage import open_catalog
+        from modules.pricing import price_matrix
+        from modules.generator import generate_tender_excel
+        # The whole catalog as one tender, so the workbook size scales with the benchmark size
+        conn = open_catalog(db_path, readonly=True)
+        rows = conn.execute('SELECT item_name, description, cost_price FROM items_master').fetchall()
+        conn.close()
+        prices = price_matrix([row[2] for row in rows], [15])[0][:, 0].tolist()
+        items = [
+            {'item_name': name, 'description': description, 'cost_price': cost,
+             'suggested_selling_price': price, 'profit_margin_percent': 15.0}
+            for (name, description, cost), price in zip(rows, prices)
+        ]
+        start = time.perf_counter()
+        written = generate_tender_excel(items, os.path.join(workdir, 'tender.xlsx'), what_if_margins=[10, 20])
+        seconds = time.perf_counter() - start
+        metrics = {'seconds': round(seconds, 4), 'rows': written,
+                   'rows_per_second': round(written / seconds, 1) if written else 0.0}
+    else:
+        raise ValueError(f"Unknown benchmark stage '{stage}'. Use one of {STAGES}.")
+    metrics['peak_rss_mb'] = peak_rss_mb()
+    return metrics
+
+def run_benchmarks(sizes=DEFAULT_SIZES, queries: int = DEFAULT_QUERIES, stages=STAGES, vocab_size: int = 2000,
+                   zipf_exponent: float = 1.1, seed: int = 0, pricing_repeats: int = DEFAULT_PRICING_REPEATS,
+                   isolate: bool = True, workdir: str = None):
+    """
+    Benchmarks the loader, matcher, pricing and generator on synthetic catalogs of each size.
+
+    Purpose:
+        - Generates a reproducible catalog, price list and tender set per size (see dbgen.py).
+        - Times each stage, recording throughput, latency percentiles and peak RSS.
+        - With isolate (the default) every stage runs in a fresh process, so peak RSS is per stage; otherwise
+          stages share this process and peak RSS is cumulative.
+
+    Args:
+        sizes (list of int, optional): Catalog sizes to benchmark.
+        queries (int, optional): Number of synthetic tenders timed per size.
+        stages (list of str, optional): Stages to run (see STAGES).
+        vocab_size (int, optional): Synthetic vocabulary size.
+        zipf_exponent (float, optional): Zipf exponent of the keyword distribution.
+        seed (int, optional): Random seed of the synthetic data.
+        pricing_repeats (int, optional): Number of timed bulk pricing passes.
+        isolate (bool, optional): Run each stage in its own process.
+        workdir (str, optional): Folder for the synthetic inputs; a temporary folder is used (and removed) if None.
+
+    Returns:
+        dict: Report with 'created', 'environment', 'config' and 'results' ({size: {stage: metrics}}).
+    """
+    logger = logging.getLogger(__name__)
+    config = {'sizes': list(sizes), 'queries': queries, 'stages': list(stages), 'vocab_size': vocab_size,
+              'zipf_exponent': zipf_exponent, 'seed': seed, 'pricing_repeats': pricing_repeats}
+    results = {}
+    root = workdir or tempfile.mkdtemp(prefix='tenderpilot-bench-')
+    try:
+        for size in sizes:
+            size_dir = os.path.join(root, str(size))
+            os.makedirs(size_dir, exist_ok=True)
+            logger.info(f"Preparing synthetic catalog of {size} items.")
+            prepare_workdir(size_dir, size, queries, vocab_size, zipf_exponent, seed)
+            results[str(size)] = {}
+            for stage in stages:
+                logger.info(f"Benchmarking {stage} at {size} items.")
+                if isolate:
+                    context = multiprocessing.get_context('spawn')
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        metrics = pool.submit(run_stage, stage, size_dir, pricing_repeats).result()
+                else:
+                    metrics = run_stage(stage, size_dir, pricing_repeats)
+                results[str(size)][stage] = metrics
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'config': config,
+        'results': results,
+    }
+
+def find_regressions(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Compares a benchmark report with a baseline report.
+    Throughputs ('..._per_second') regress when they drop, and timings ('seconds', '..._ms') and 'peak_rss_mb'
+    when they grow, by more than threshold (a fraction of the baseline value). Metrics missing from either
+    report are skipped.
+    Returns a list of human-readable regression messages (empty if none).
+    """
+    regressions = []
+    for size, stages in report['results'].items():
+        for stage, metrics in stages.items():
+            base_metrics = baseline.get('results', {}).get(size, {}).get(stage, {})
+            for name, value in metrics.items():
+                base = base_metrics.get(name)
+                if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or base <= 0:
+                    continue
+                if name.endswith('_per_second'):
+                    change = (base - value) / base
+                elif name == 'seconds' or name.endswith('_ms') or name == 'peak_rss_mb':
+                    change = (value - base) / base
+                else:
+                    continue
+                if change > threshold:
+                    regressions.append(
+                        f"{stage} @ {size} items: {name} {value} vs baseline {base} ({change:+.0%} worse)"
+                    )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TenderPilot on synthetic catalogs.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Catalog sizes")
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES, help="Tenders timed per size")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help="Stages to run")
+    parser.add_argument('--vocab-size', type=int, default=2000, help="Synthetic vocabulary size")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of the keyword distribution")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write this run's report")
+    parser.add_argument('--baseline', default=None, help="Baseline report to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Fraction a metric may worsen before it is flagged")
+    parser.add_argument('--no-isolate', action='store_true', help="Run all stages in this process")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmarks(args.sizes, args.queries, args.stages, args.vocab_size, args.zipf, args.seed,
+                            isolate=not args.no_isolate)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for size, stages in report['results'].items():
+        for stage, metrics in stages.items():
+            print(f"{size:>8} {stage:<17} " + ', '.join(f"{k}={v}" for k, v in metrics.items()))
+    print(f"Report written to {args.output}")
+    status = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.threshold)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions against {args.baseline}.")
+    if args.save_baseline and args.baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import json
+import hashlib
+
+def make_item_key(value, source: str = None):
+    """
+    Normalises a key value (an SKU or, by default, the item name) into a stable item key.
+    With a source (the supplier a price list belongs to), the key is qualified by it, so the same name or SKU
+    from two suppliers stays two catalog items.
+    Returns None for missing values.
+    """
+    if value is None:
+        return None
+    key = ' '.join(str(value).lower().split())
+    if not key:
+        return None
+    return f"{source}\x1f{key}" if source else key
+
+def content_hash(item_name, description, cost_price, category=None) -> str:
+    """
+    Returns a short hash of the catalog fields of a row, used to detect rows that changed since the last sync.
+    """
+    payload = f"{item_name}\x1f{description}\x1f{float(cost_price)!r}"
+    if category is not None:
+        payload += f"\x1f{category}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def upsert_catalog_rows(cursor, rows, source: str = None):
+    """
+    Inserts new rows and updates changed rows of 'items_master', skipping rows whose content hash is unchanged.
+    The caller owns the transaction.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on a database with the catalog sync columns.
+        rows (list of tuple): (item_key, item_name, description, cost_price, category) tuples. If a key
+            repeats, the last row wins.
+        source (str, optional): Source recorded on inserted rows; their keys should be qualified by it (see
+            make_item_key).
+
+    Returns:
+        dict: Counts of 'inserted', 'updated' and 'unchanged' rows, plus 'updated_ids', the rowids of updated rows.
+    """
+    latest = {}
+    for item_key, item_name, description, cost_price, category in rows:
+        digest = content_hash(item_name, description, cost_price, category)
+        latest[item_key] = (item_name, description, cost_price, category, digest)
+    cursor.execute(
+        'SELECT item_key, rowid, content_hash, is_active FROM items_master '
+        'WHERE item_key IN (SELECT value FROM json_each(?))',
+        (json.dumps(list(latest)),)
+    )
+    existing = {key: (rowid, digest, active) for key, rowid, digest, active in cursor.fetchall()}
+    inserts, updates, updated_ids = [], [], []
+    unchanged = 0
+    for item_key, (item_name, description, cost_price, category, digest) in latest.items():
+        current = existing.get(item_key)
+        if current is None:
+            inserts.append((item_key, item_name, description, cost_price, category, digest, source))
+        elif current[1] == digest and current[2]:
+            unchanged += 1
+        else:
+            updates.append((item_name, description, cost_price, category, digest, current[0]))
+            updated_ids.append(current[0])
+    if inserts:
+        cursor.executemany(
+            'INSERT INTO items_master (item_key, item_name, description, cost_price, category, content_hash, '
+            'source, is_active) VALUES (?, ?, ?, ?, ?, ?, ?, 1)',
+            inserts
+        )
+    if updates:
+        cursor.executemany(
+            'UPDATE items_master SET item_name = ?, description = ?, cost_price = ?, category = ?, '
+            'content_hash = ?, is_active = 1 WHERE rowid = ?',
+            updates
+        )
+    return {'inserted': len(inserts), 'updated': len(updates), 'unchanged': unchanged, 'updated_ids': updated_ids}
+
+def ensure_catalog_version(conn):
+    """
+    Ensures 'items_master' carries a catalog version counter that every insert, update and delete increments.
+    Caches keyed on the version are invalidated by any catalog write, whichever code path makes it.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'items_master_version_ai'")
+    if cursor.fetchone():
+        return
+    cursor.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('version', 0)")
+    for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS items_master_version_{suffix} AFTER {event} ON items_master BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+            END
+        ''')
+    conn.commit()
+
+def catalog_version(conn) -> int:
+    """
+    Returns the current catalog version (see ensure_catalog_version).
+    """
+    return conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()[0]
@@ -0,0 +1,354 @@
+import os
+import re
+import sys
+import json
+import zlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where only writers within one process are serialised
+    fcntl = None
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.storage import open_catalog
+
+DEFAULT_ENCODER = 'hashed-tfidf'
+DEFAULT_BATCH_SIZE = 1024
+
+class HashedTfidfEncoder:
+    """
+    Offline encoder that hashes words and character trigrams into a fixed number of signed buckets.
+    Document vectors hold log-scaled term frequencies only, so they never need re-encoding when the catalog
+    grows; inverse document frequencies are applied to the query side from the store's bucket counts.
+    """
+    name = 'hashed-tfidf'
+    uses_idf = True
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text):
+        for word in re.findall(r'\w+', (text or '').lower()):
+            yield word, 1.0
+            padded = f'<{word}>'
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def _hashed_tf(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        counts = {}
+        for feature, weight in self._features(text):
+            counts[feature] = counts.get(feature, 0.0) + weight
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vec[h % self.dim] += sign * np.log1p(count)
+        return vec
+
+    def encode_documents(self, texts):
+        matrix = np.stack([self._hashed_tf(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        return _normalize_rows(matrix)
+
+    def encode_query(self, text, df=None, n_docs=0):
+        vec = self._hashed_tf(text)
+        if df is not None and n_docs:
+            vec *= (np.log((n_docs + 1) / (df + 1)) + 1).astype(np.float32)
+        return _normalize_rows(vec[None, :])[0]
+
+class SentenceTransformerEncoder:
+    """
+    Encoder backed by a sentence-transformers model (downloaded on first use).
+    """
+    name = 'sentence-transformers'
+    uses_idf = False
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(f"sentence-transformers is not installed: {e}")
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode_documents(self, texts):
+        return self.model.encode(list(texts), batch_size=64, normalize_embeddings=True).astype(np.float32)
+
+    def encode_query(self, text, df=None, n_docs=0):
+        return self.encode_documents([text])[0]
+
+ENCODERS = {
+    HashedTfidfEncoder.name: HashedTfidfEncoder,
+    SentenceTransformerEncoder.name: SentenceTransformerEncoder,
+}
+
+_encoder_instances = {}
+_store_locks = {}
+_store_locks_lock = threading.Lock()
+
+def get_encoder(name: str = DEFAULT_ENCODER):
+    """
+    Returns a shared encoder instance for the given backend name.
+    Raises ValueError for unknown backends.
+    """
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Available: {sorted(ENCODERS)}")
+    if name not in _encoder_instances:
+        _encoder_instances[name] = ENCODERS[name]()
+    return _encoder_instances[name]
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+def embedding_store_path(sqlite_db: str):
+    """
+    Returns the directory holding the embedding store for a database, e.g. 'db/items.embeddings' for 'db/items.db'.
+    """
+    return os.path.splitext(sqlite_db)[0] + '.embeddings'
+
+@contextmanager
+def store_lock(store_dir: str):
+    """
+    Serialises writers of an embedding store: a per-store lock between threads of this process, and an exclusive
+    fcntl lock on the store's 'lock' file between processes. Creates the store directory if needed.
+    """
+    path = os.path.abspath(store_dir)
+    with _store_locks_lock:
+        lock = _store_locks.setdefault(path, threading.Lock())
+    with lock:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+def _read_meta(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(store_dir, meta):
+    tmp_path = os.path.join(store_dir, 'meta.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(store_dir, 'meta.json'))
+
+def _write_df(store_dir, df):
+    tmp_path = os.path.join(store_dir, 'df.f64.tmp')
+    df.tofile(tmp_path)
+    os.replace(tmp_path, os.path.join(store_dir, 'df.f64'))
+
+def _reset_store(store_dir, encoder):
+    # New files replace the old ones, so readers still mapping the old vectors never see them truncated
+    for name in ('vectors.f32', 'rowids.i64'):
+        open(os.path.join(store_dir, name + '.tmp'), 'wb').close()
+        os.replace(os.path.join(store_dir, name + '.tmp'), os.path.join(store_dir, name))
+    _write_df(store_dir, np.zeros(encoder.dim, dtype=np.float64))
+    meta = {'backend': encoder.name, 'dim': encoder.dim, 'count': 0, 'last_rowid': 0}
+    _write_meta(store_dir, meta)
+    return meta
+
+def update_embedding_store(sqlite_db: str, backend: str = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Brings the memory-mapped embedding store of a database up to date with its 'items_master' table.
+
+    Purpose:
+        - Encodes only catalog rows added since the last update, in batches, and appends them to the store.
+        - Rebuilds the store from scratch if it is missing or was built with a different backend.
+        - Meta data is written last, so an interrupted update is rolled back on the next call and readers only
+          ever see the rows it counts.
+        - Runs under store_lock, so concurrent writers (threads or processes) never interleave their appends.
+          Only catalog writers (loader, ingest, dbgen) and the service at start-up call it; queries never do.
+
+    Args:
+        sqlite_db (str): Path to the SQLite database file.
+        backend (str, optional): Name of the embedding backend. Defaults to the backend the store was built with,
+            or the offline hashed TF-IDF encoder for a new store.
+        batch_size (int, optional): Number of rows encoded per batch.
+
+    Returns:
+        int: Number of rows added to the store.
+    """
+    store_dir = embedding_store_path(sqlite_db)
+    with store_lock(store_dir):
+        return _update_store(sqlite_db, store_dir, backend, batch_size)
+
+def _update_store(sqlite_db, store_dir, backend, batch_size):
+    logger = logging.getLogger(__name__)
+    meta = _read_meta(store_dir)
+    if backend is None:
+        backend = meta['backend'] if meta else DEFAULT_ENCODER
+    encoder = get_encoder(backend)
+    if meta is None or meta['backend'] != encoder.name or meta['dim'] != encoder.dim:
+        logger.info(f"Creating embedding store at {store_dir} ({encoder.name}, dim {encoder.dim}).")
+        meta = _reset_store(store_dir, encoder)
+    vectors_path = os.path.join(store_dir, 'vectors.f32')
+    rowids_path = os.path.join(store_dir, 'rowids.i64')
+    df_path = os.path.join(store_dir, 'df.f64')
+    # Drop anything past the committed count left behind by an interrupted update
+    with open(vectors_path, 'r+b') as f:
+        f.truncate(meta['count'] * meta['dim'] * 4)
+    with open(rowids_path, 'r+b') as f:
+        f.truncate(meta['count'] * 8)
+    df = np.fromfile(df_path, dtype=np.float64)
+
+    conn = open_catalog(sqlite_db, readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT rowid, item_name, description FROM items_master WHERE rowid > ? ORDER BY rowid',
+            (meta['last_rowid'],)
+        )
+        added = 0
+        with open(vectors_path, 'ab') as vf, open(rowids_path, 'ab') as rf:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                matrix = encoder.encode_documents([f"{name or ''} {desc or ''}" for _, name, desc in rows])
+                vf.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+                rf.write(np.array([r[0] for r in rows], dtype=np.int64).tobytes())
+                df += (matrix != 0).sum(axis=0)
+                added += len(rows)
+                meta['last_rowid'] = rows[-1][0]
+    finally:
+        conn.close()
+    if added:
+        _write_df(store_dir, df)
+        meta['count'] += added
+        _write_meta(store_dir, meta)
+        logger.info(f"Added {added} rows to embedding store ({meta['count']} total).")
+    return added
+
+def refresh_embedding_rows(sqlite_db: str, rowids, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Re-encodes catalog rows whose content changed, overwriting their vectors in place (under store_lock).
+    Rows that are not in the store yet are left to update_embedding_store; does nothing if no store exists.
+    Returns the number of vectors rewritten.
+    """
+    store_dir = embedding_store_path(sqlite_db)
+    if not os.path.isdir(store_dir) or not len(rowids):
+        return 0
+    with store_lock(store_dir):
+        return _refresh_rows(sqlite_db, store_dir, rowids, batch_size)
+
+def _refresh_rows(sqlite_db, store_dir, rowids, batch_size):
+    meta = _read_meta(store_dir)
+    if meta is None or not meta['count']:
+        return 0
+    encoder = get_encoder(meta['backend'])
+    count, dim = meta['count'], meta['dim']
+    stored_ids = np.fromfile(os.path.join(store_dir, 'rowids.i64'), dtype=np.int64, count=count)
+    # Rows are appended in rowid order, so positions can be found by binary search
+    wanted = np.unique(np.asarray(rowids, dtype=np.int64))
+    positions = np.searchsorted(stored_ids, wanted)
+    present = (positions < count) & (stored_ids[np.minimum(positions, count - 1)] == wanted)
+    position_of = dict(zip(wanted[present].tolist(), positions[present].tolist()))
+    if not position_of:
+        return 0
+    df_path = os.path.join(store_dir, 'df.f64')
+    df = np.fromfile(df_path, dtype=np.float64)
+    vectors = np.memmap(os.path.join(store_dir, 'vectors.f32'), dtype=np.float32, mode='r+', shape=(count, dim))
+    conn = open_catalog(sqlite_db, readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT rowid, item_name, description FROM items_master WHERE rowid IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(position_of)),)
+        )
+        rewritten = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            index = [position_of[r[0]] for r in rows]
+            matrix = encoder.encode_documents([f"{name or ''} {desc or ''}" for _, name, desc in rows])
+            df += (matrix != 0).sum(axis=0) - (vectors[index] != 0).sum(axis=0)
+            vectors[index] = matrix
+            rewritten += len(rows)
+    finally:
+        conn.close()
+    vectors.flush()
+    _write_df(store_dir, df)
+    return rewritten
+
+def load_embedding_store(sqlite_db: str):
+    """
+    Opens the embedding store of a database read-only.
+    Only the rows counted in the meta data are mapped, so rows a concurrent update is still appending (or a
+    rebuild has not written yet) are never read.
+    Returns a tuple (vectors, rowids, df, meta) where vectors is a memory-mapped (count, dim) float32 matrix,
+    or None if the store does not exist yet.
+    """
+    store_dir = embedding_store_path(sqlite_db)
+    meta = _read_meta(store_dir)
+    if meta is None:
+        return None
+    dim = meta['dim']
+    vectors_path = os.path.join(store_dir, 'vectors.f32')
+    rowids_path = os.path.join(store_dir, 'rowids.i64')
+    # A rebuild replaces the files before it rewrites the meta data, so they may hold fewer rows than it says
+    count = min(meta['count'], os.path.getsize(vectors_path) // (dim * 4), os.path.getsize(rowids_path) // 8)
+    if count:
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(count, dim))
+        rowids = np.memmap(rowids_path, dtype=np.int64, mode='r', shape=(count,))
+    else:
+        vectors = np.zeros((0, dim), dtype=np.float32)
+        rowids = np.zeros(0, dtype=np.int64)
+    df = np.fromfile(os.path.join(store_dir, 'df.f64'), dtype=np.float64)
+    return vectors, rowids, df, meta
+
+def search_embeddings(sqlite_db: str, query: str, top_k: int, backend: str = None):
+    """
+    Finds the catalog rows most similar to a query with one matrix-vector product and a top-k selection.
+    The query is encoded with the backend the store was built with. The store is only read, never updated.
+    Returns a list of (rowid, similarity) tuples, most similar first, keeping only positive similarities.
+    Raises ValueError if backend is given and differs from the store's backend.
+    """
+    store = load_embedding_store(sqlite_db)
+    if store is None or top_k <= 0:
+        return []
+    vectors, rowids, df, meta = store
+    if backend is not None and backend != meta['backend']:
+        raise ValueError(f"The embedding store of {sqlite_db} was built with '{meta['backend']}', not '{backend}'; "
+                         f"rebuild it with --backend {backend}.")
+    if not len(rowids):
+        return []
+    encoder = get_encoder(meta['backend'])
+    query_vec = encoder.encode_query(query, df if encoder.uses_idf else None, len(rowids))
+    scores = vectors @ query_vec
+    k = min(top_k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(rowids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or bring up to date the embedding store of a catalog.")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    parser.add_argument('--backend', default=None, choices=sorted(ENCODERS),
+                        help="Embedding backend (default: the store's backend, or hashed TF-IDF for a new store)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if not os.path.exists(args.db):
+        print(f"Error: Database file not found: {args.db}")
+        return
+    added = update_embedding_store(args.db, args.backend)
+    print(f"Embedding store of {args.db} is up to date ({added} rows added).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import math
+import logging
+import threading
+import numpy as np
+from modules.search_index import VOCAB_TABLE, vocabulary_version
+
+# Requirement tokens shorter than this are too ambiguous to correct (and FTS prefix matching covers them)
+MIN_FUZZY_LENGTH = 4
+# Share of a token's trigrams a catalog term must contain to be checked by edit distance
+MIN_TRIGRAM_OVERLAP = 0.4
+# Catalog terms added per misspelt token
+MAX_EXPANSIONS = 3
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def trigrams(term: str):
+    """
+    Returns the distinct trigrams of a term padded as '$$term$', so prefixes and suffixes weigh in.
+    """
+    padded = f'$${term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_edit_distance(term: str) -> int:
+    """
+    Returns the number of edits tolerated for a term: one per three characters, at least one.
+    """
+    return max(1, len(term) // 3)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Returns the Levenshtein distance between a and b, or limit + 1 as soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def is_indexed_term(term: str) -> bool:
+    """
+    Returns whether a vocabulary term takes part in fuzzy matching: words of MIN_FUZZY_LENGTH or more
+    characters without digits (model numbers and sizes are never corrected).
+    """
+    return len(term) >= MIN_FUZZY_LENGTH and not any(c.isdigit() for c in term)
+
+class TrigramIndex:
+    """
+    A trigram inverted index over the catalog vocabulary, for finding the catalog terms closest to a misspelt
+    requirement token.
+    Candidates are the terms sharing enough trigrams with the token, counted in one vectorised pass over the
+    posting lists; only those are checked by edit distance. Terms are added and removed in place, so a
+    vocabulary change costs work proportional to the terms that changed.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._ids = {}
+        self._terms = []
+        self._lengths = []
+        self._doc_counts = []
+        self._free = []
+        self._postings = {}
+        self._arrays = {}
+        self._length_array = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, term):
+        return term in self._ids
+
+    def add(self, term: str, doc_count: int = 1):
+        """
+        Adds a term (or updates its item count if present).
+        """
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            self._doc_counts[term_id] = doc_count
+            return
+        if self._free:
+            term_id = self._free.pop()
+            self._terms[term_id], self._lengths[term_id], self._doc_counts[term_id] = term, len(term), doc_count
+        else:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._lengths.append(len(term))
+            self._doc_counts.append(doc_count)
+        self._ids[term] = term_id
+        for gram in trigrams(term):
+            self._postings.setdefault(gram, set()).add(term_id)
+            self._arrays.pop(gram, None)
+        self._length_array = None
+
+    def remove(self, term: str):
+        """
+        Removes a term if present.
+        """
+        term_id = self._ids.pop(term, None)
+        if term_id is None:
+            return
+        for gram in trigrams(term):
+            postings = self._postings[gram]
+            postings.discard(term_id)
+            if not postings:
+                del self._postings[gram]
+            self._arrays.pop(gram, None)
+        # A negative length never passes the length filter, so the slot is inert until reused
+        self._terms[term_id], self._lengths[term_id], self._doc_counts[term_id] = None, -1, 0
+        self._free.append(term_id)
+        self._length_array = None
+
+    def update(self, vocabulary: dict):
+        """
+        Brings the index in line with vocabulary ({term: item count}), adding and removing only the terms that
+        differ. Returns the number of terms (added, removed).
+        """
+        removed = [term for term in self._ids if term not in vocabulary]
+        for term in removed:
+            self.remove(term)
+        added = 0
+        for term, doc_count in vocabulary.items():
+            if term not in self._ids:
+                added += 1
+            self.add(term, doc_count)
+        return added, len(removed)
+
+    def _posting_array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            array = self._arrays[gram] = np.fromiter(self._postings[gram], dtype=np.int64)
+        return array
+
+    def expand(self, token: str, max_expansions: int = MAX_EXPANSIONS):
+        """
+        Returns up to max_expansions catalog terms within max_edit_distance(token) edits of token, closest
+        first (ties go to the term in more items). A token that is itself a catalog term, or is too short or
+        numeric to correct, has no expansions.
+        """
+        if token in self._ids or not is_indexed_term(token) or not self._ids:
+            return []
+        grams = [gram for gram in trigrams(token) if gram in self._postings]
+        if not grams:
+            return []
+        limit = max_edit_distance(token)
+        if self._length_array is None:
+            self._length_array = np.array(self._lengths, dtype=np.int64)
+        shared = np.bincount(np.concatenate([self._posting_array(gram) for gram in grams]),
+                             minlength=len(self._terms))
+        wanted = math.ceil(MIN_TRIGRAM_OVERLAP * len(trigrams(token)))
+        candidates = np.flatnonzero((shared >= wanted) & (np.abs(self._length_array - len(token)) <= limit))
+        scored = []
+        for term_id in candidates.tolist():
+            term = self._terms[term_id]
+            distance = edit_distance(token, term, limit)
+            if distance <= limit:
+                scored.append((distance, -self._doc_counts[term_id], term))
+        return [term for _, _, term in sorted(scored)[:max_expansions]]
+
+def read_vocabulary(conn) -> dict:
+    """
+    Returns the fuzzy-matchable terms of the full-text index with the number of items containing each.
+    """
+    return {term: doc_count for term, doc_count in conn.execute(f'SELECT term, doc FROM {VOCAB_TABLE}')
+            if is_indexed_term(term)}
+
+def load_term_index(sqlite_db: str, conn) -> TrigramIndex:
+    """
+    Returns the trigram index of a database's catalog vocabulary, kept per database.
+    The vocabulary is only re-read when the vocabulary version moved since the index was last refreshed, i.e.
+    after item text was inserted, deleted or edited by any writer; price, status and source updates cost one
+    counter lookup. Only the terms that appeared or disappeared are then re-indexed.
+    conn is an open, migrated connection to the database.
+    """
+    logger = logging.getLogger(__name__)
+    path = os.path.abspath(sqlite_db)
+    version = vocabulary_version(conn)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = TrigramIndex()
+        if index.version != version:
+            added, removed = index.update(read_vocabulary(conn))
+            index.version = version
+            logger.debug(f"Trigram index of {sqlite_db} at vocabulary version {version}: "
+                         f"{added} terms added, {removed} removed, {len(index)} in total.")
+        return index
+
+def expand_keywords(index: TrigramIndex, keywords, max_expansions: int = MAX_EXPANSIONS):
+    """
+    Returns the keywords followed by the catalog terms each misspelt keyword expands to, without duplicates.
+    """
+    expanded = dict.fromkeys(keywords)
+    for keyword in keywords:
+        expanded.update(dict.fromkeys(index.expand(keyword, max_expansions)))
+    return list(expanded)
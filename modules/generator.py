@@ -1,52 +1,106 @@
-import pandas as pd
+import math
 import logging
 import datetime
+from itertools import chain, islice
+import xlsxwriter
+from modules.pricing import price_matrix, margin_column_name
+from modules.metrics import stage_timer, count
 
-def generate_tender_excel(recommended_items, output_filename):
+TENDER_COLUMNS = ['Item Name', 'Description', 'Cost Price', 'Selling Price', 'Profit Margin', 'Timestamp']
+# Layout for line-item tenders: one row per recommended option of each line, with quantity-extended totals
+LINE_ITEM_COLUMNS = ['Line', 'Requirement', 'Quantity', 'Option', 'Item Name', 'Description', 'Cost Price',
+                     'Selling Price', 'Profit Margin', 'Line Cost', 'Line Total', 'Timestamp']
+CURRENCY_COLUMNS = ('Cost Price', 'Selling Price', 'Line Cost', 'Line Total')
+# Rows buffered at a time when pricing what-if margins while writing
+WRITE_CHUNK_SIZE = 1000
+
+def generate_tender_excel(recommended_items, output_filename, what_if_margins=None):
     """
     Generates or updates an Excel file for the final tender document.
+    Rows are written straight to the workbook in xlsxwriter's constant_memory mode, so recommended_items may be
+    a generator (e.g. chained chunks from iter_recommended_items) and peak memory stays bounded for any tender size.
+    Items carrying a 'quantity' (line-item tenders, see modules.tender_lines.line_item_rows) are written in the
+    LINE_ITEM_COLUMNS layout: line, requirement, quantity and option rank next to the item, the line cost and
+    line total (unit prices times quantity), and a closing total row over the best option of every line.
     Args:
-        recommended_items (list of dict): List of items with keys 'item_name', 'description', 'cost_price', 'suggested_selling_price', 'profit_margin_percent'.
+        recommended_items (iterable of dict): Items with keys 'item_name', 'description', 'cost_price', 'suggested_selling_price', 'profit_margin_percent'
+            (plus 'line', 'requirements', 'quantity' and 'option' for line-item tenders).
         output_filename (str): Name of the Excel file to create or update (e.g., 'Tender_ABC.xlsx').
+        what_if_margins (list of float, optional): Extra margins to price side by side, one 'Price @ <margin>%' column each.
     Returns:
-        None
+        int: Number of item rows written (0 if there was nothing to write or writing failed).
     """
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
-    if not recommended_items:
+    items = iter(recommended_items or ())
+    first = next(items, None)
+    if first is None:
         logger.warning("No recommended items to generate the tender")
         print("No recommended items to generate the tender")
-        return
+        return 0
+    items = chain([first], items)
     try:
-        logger.info(f"Generating tender Excel file: {output_filename}")
+        logger.debug(f"Generating tender Excel file: {output_filename}")
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        df = pd.DataFrame([
-            {
-                'Item Name': item['item_name'],
-                'Description': item['description'],
-                'Cost Price': item['cost_price'],
-                'Selling Price': item['suggested_selling_price'],
-                'Profit Margin': item['profit_margin_percent'],
-                'Timestamp': timestamp
-            }
-            for item in recommended_items
-        ])
-        logger.info(f"Writing {len(df)} items to Excel file.")
-        # Write to Excel with formatting
-        with pd.ExcelWriter(output_filename, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False)
-            workbook = writer.book
-            worksheet = writer.sheets['Sheet1']
-            # Format for currency columns
-            currency_format = workbook.add_format({'num_format': '"₹"#,##0.00'})
-            # Find column indices
-            cost_col = df.columns.get_loc('Cost Price')
-            sell_col = df.columns.get_loc('Selling Price')
-            worksheet.set_column(cost_col, cost_col, 15, currency_format)
-            worksheet.set_column(sell_col, sell_col, 15, currency_format)
-            # Optionally, set width for other columns
-            worksheet.set_column(0, len(df.columns)-1, 20)
-        logger.info(f"Tender Excel file '{output_filename}' generated successfully.")
+        margins = list(what_if_margins or [])
+        line_items = 'quantity' in first
+        columns = (LINE_ITEM_COLUMNS if line_items else TENDER_COLUMNS) + [margin_column_name(m) for m in margins]
+        with stage_timer('write_xlsx'):
+            workbook = xlsxwriter.Workbook(output_filename, {'constant_memory': True})
+            try:
+                worksheet = workbook.add_worksheet('Sheet1')
+                header_format = workbook.add_format(
+                    {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+                )
+                # Format for currency columns
+                currency_format = workbook.add_format({'num_format': '"₹"#,##0.00'})
+                # Column formats must be set before any rows are written in constant_memory mode
+                worksheet.set_column(0, len(columns) - 1, 20)
+                for name in columns:
+                    if name in CURRENCY_COLUMNS or name.startswith('Price @ '):
+                        col = columns.index(name)
+                        worksheet.set_column(col, col, 15, currency_format)
+                worksheet.write_row(0, 0, columns, header_format)
+                row_number = 0
+                total_cost = total_price = 0.0
+                while True:
+                    chunk = list(islice(items, WRITE_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    what_if = price_matrix([item['cost_price'] for item in chunk], margins)[0] if margins else None
+                    for i, item in enumerate(chunk):
+                        row_number += 1
+                        values = [
+                            item['item_name'],
+                            item['description'],
+                            item['cost_price'],
+                            item['suggested_selling_price'],
+                            item['profit_margin_percent'],
+                            timestamp
+                        ]
+                        if line_items:
+                            quantity = item['quantity']
+                            line_cost = None if item['cost_price'] is None else item['cost_price'] * quantity
+                            line_total = (None if item['suggested_selling_price'] is None
+                                          else item['suggested_selling_price'] * quantity)
+                            if item.get('option') == 1:
+                                total_cost += line_cost
+                                total_price += line_total
+                            values = ([item['line'], item['requirements'], quantity, item.get('option')]
+                                      + values[:-1] + [line_cost, line_total, timestamp])
+                        if what_if is not None:
+                            values.extend(None if math.isnan(p) else p for p in what_if[i].tolist())
+                        worksheet.write_row(row_number, 0, values)
+                if line_items:
+                    totals_format = workbook.add_format({'bold': True, 'num_format': '"₹"#,##0.00'})
+                    worksheet.write(row_number + 1, 0, 'Total (best option per line)', totals_format)
+                    worksheet.write(row_number + 1, columns.index('Line Cost'), total_cost, totals_format)
+                    worksheet.write(row_number + 1, columns.index('Line Total'), total_price, totals_format)
+            finally:
+                workbook.close()
+        count('rows_written', row_number)
+        logger.info(f"Wrote {row_number} items to tender Excel file '{output_filename}'.")
+        return row_number
     except Exception as e:
         logger.error(f"Error generating tender Excel file: {e}")
-        print(f"Error generating tender Excel file: {e}")
\ No newline at end of file
+        print(f"Error generating tender Excel file: {e}")
+        return 0
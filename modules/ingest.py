@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.loader import (
+    DEFAULT_CHUNK_SIZE, REQUIRED_COLUMNS, open_sheet_stream, keyed_chunk_rows, auto_map_columns,
+    record_rejected_rows, create_items_master_table, connect_sqlite_db
+)
+from modules.catalog import upsert_catalog_rows
+from modules.embeddings import embedding_store_path, update_embedding_store, refresh_embedding_rows
+from modules.snapshot import refresh_catalog_snapshot
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv', '.parquet')
+# Optional profile entry naming a stable identifier column (e.g. an SKU) used as the item key
+KEY_FIELD = 'Item Key'
+# Row batches waiting for the writer per file; bounds memory when parsing outpaces SQLite
+QUEUE_SIZE = 64
+
+def header_signature(columns: list) -> str:
+    """
+    Returns a signature identifying a supplier's header layout, ignoring case and surrounding whitespace.
+    """
+    normalized = '\x1f'.join(str(c).strip().lower() for c in columns)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+def default_profiles_path(sqlite_db: str) -> str:
+    """
+    Returns the default location of the column-mapping profiles, next to the database.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(sqlite_db)), 'column_profiles.json')
+
+def load_mapping_profiles(profiles_path: str) -> dict:
+    """
+    Loads saved column-mapping profiles keyed by header signature. Returns an empty dict if there are none.
+    """
+    try:
+        with open(profiles_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_mapping_profiles(profiles_path: str, profiles: dict):
+    """
+    Saves column-mapping profiles atomically.
+    """
+    tmp_path = profiles_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, profiles_path)
+
+def save_mapping_profile(profiles_path: str, columns: list, mapping: dict):
+    """
+    Records the mapping for a header layout, so later files with the same headers are ingested without prompts.
+    mapping maps 'Item Name', 'Description', 'Cost Price' and optionally 'Item Key' to column names.
+    """
+    profiles = load_mapping_profiles(profiles_path)
+    profiles[header_signature(columns)] = {'columns': list(columns), 'mapping': mapping}
+    save_mapping_profiles(profiles_path, profiles)
+
+def parse_supplier_file(path: str, profiles: dict, row_queue, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Parses and validates one supplier file in a worker process, streaming its rows to the file's writer queue.
+    The mapping comes from the saved profile for the file's header layout, falling back to fuzzy matching.
+    Batches are put as (path, rows), and a final batch without rows marks the end of the file.
+    Returns a per-file summary; files that cannot be mapped are reported with an error instead of prompting.
+    """
+    summary = {'file': path, 'signature': None, 'columns': None, 'mapping': None, 'rows': 0, 'rejected': 0,
+               'rejected_rows': [], 'error': None}
+    try:
+        columns, chunks = open_sheet_stream(path, chunk_size)
+        summary['signature'] = header_signature(columns)
+        summary['columns'] = columns
+        profile = profiles.get(summary['signature'])
+        mapping = dict(profile['mapping']) if profile else auto_map_columns(columns)
+        missing = [req for req in REQUIRED_COLUMNS if mapping.get(req) not in columns]
+        if missing:
+            summary['error'] = f"No column mapping for {missing}; add a profile for header {summary['signature']}."
+            return summary
+        summary['mapping'] = mapping
+        key_column = mapping.get(KEY_FIELD)
+        first_row = 2
+        for chunk in chunks:
+            rows, rejected = keyed_chunk_rows(chunk, mapping, key_column)
+            if rows:
+                row_queue.put((path, rows))
+                summary['rows'] += len(rows)
+            record_rejected_rows(summary, rejected, first_row)
+            first_row += len(chunk)
+    except Exception as e:
+        summary['error'] = f"Error reading {path}: {e}"
+    finally:
+        row_queue.put((path, None))
+    return summary
+
+def _write_rows(sqlite_db: str, row_queues: list, counts: dict, errors: list):
+    """
+    Single writer: upserts queued row batches into 'items_master', committing each batch in WAL mode.
+    Each file has its own bounded queue and the queues are drained one after another in path order, so when
+    several files share an item key the row from the last file in path order wins on every run. Parsers of
+    later files block once their queue is full instead of buffering here.
+    Every queue is drained up to its end marker, so parser processes never block on a dead writer.
+    """
+    conn = None
+    try:
+        conn = connect_sqlite_db(sqlite_db)
+    except Exception as e:
+        errors.append(f"Error opening database for writing: {e}")
+        conn = None
+
+    def write(path, rows):
+        if conn is None:
+            return
+        try:
+            result = upsert_catalog_rows(conn.cursor(), rows)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            errors.append(f"Error writing rows from {path}: {e}")
+            return
+        file_counts = counts.setdefault(path, {'inserted': 0, 'updated': 0, 'unchanged': 0, 'updated_ids': []})
+        for name in ('inserted', 'updated', 'unchanged'):
+            file_counts[name] += result[name]
+        file_counts['updated_ids'].extend(result['updated_ids'])
+
+    for row_queue in row_queues:
+        while True:
+            # None is put on every queue once the pool has exited, in case a worker died before its end marker
+            item = row_queue.get()
+            if item is None or item[1] is None:
+                break
+            write(*item)
+    if conn is not None:
+        conn.close()
+
+def ingest_directory(directory: str, sqlite_db: str, profiles_path: str = None, workers: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Ingests every supplier workbook in a directory into the 'items_master' catalog without prompting.
+
+    Purpose:
+        - Maps each file's columns through saved profiles keyed by header signature (fuzzy matching otherwise;
+          successful fuzzy mappings are saved as new profiles).
+        - Parses and validates files in a process pool, each file read once as a stream.
+        - Funnels validated row batches through one bounded queue per file to one writer thread, which upserts
+          them into SQLite in WAL mode, so parsing scales with cores while writes never contend.
+        - Applies batches in sorted path order, so an item key found in several files always ends up with the
+          row of the last of them, however the parsers are scheduled; parsers ahead of the writer block.
+
+    Args:
+        directory (str): Folder containing .xlsx/.xlsm/.xls/.csv/.parquet supplier files.
+        sqlite_db (str): Path to the SQLite database file.
+        profiles_path (str, optional): Column-mapping profiles file. Defaults to column_profiles.json next to the db.
+        workers (int, optional): Number of parser processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): Number of rows parsed and written per batch.
+
+    Returns:
+        dict: 'files' (per-file summaries with inserted/updated/unchanged/rejected counts and any error),
+        'totals' across all files and 'write_errors' from the writer thread.
+    """
+    logger = logging.getLogger(__name__)
+    profiles_path = profiles_path or default_profiles_path(sqlite_db)
+    profiles = load_mapping_profiles(profiles_path)
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith('~$')
+    )
+    logger.info(f"Ingesting {len(paths)} supplier files from {directory}.")
+    create_items_master_table(sqlite_db)
+
+    counts, write_errors, summaries = {}, [], []
+    with multiprocessing.Manager() as manager:
+        row_queues = [manager.Queue(QUEUE_SIZE) for _ in paths]
+        writer = threading.Thread(target=_write_rows, args=(sqlite_db, row_queues, counts, write_errors), daemon=True)
+        writer.start()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(parse_supplier_file, path, profiles, row_queue, chunk_size)
+                           for path, row_queue in zip(paths, row_queues)]
+                for future in as_completed(futures):
+                    summaries.append(future.result())
+        finally:
+            for row_queue in row_queues:
+                row_queue.put(None)
+            writer.join()
+
+    totals = {'files': len(paths), 'failed': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0}
+    updated_ids = []
+    learned = False
+    for summary in sorted(summaries, key=lambda s: s['file']):
+        file_counts = counts.get(summary['file'], {'inserted': 0, 'updated': 0, 'unchanged': 0, 'updated_ids': []})
+        updated_ids.extend(file_counts.pop('updated_ids'))
+        summary.update(file_counts)
+        if summary['error']:
+            totals['failed'] += 1
+            logger.warning(summary['error'])
+        elif summary['signature'] not in profiles:
+            profiles[summary['signature']] = {'columns': summary['columns'], 'mapping': summary['mapping']}
+            learned = True
+        for name in ('inserted', 'updated', 'unchanged', 'rejected'):
+            totals[name] += summary[name]
+    if learned:
+        save_mapping_profiles(profiles_path, profiles)
+    for error in write_errors:
+        logger.error(error)
+    if os.path.isdir(embedding_store_path(sqlite_db)):
+        refresh_embedding_rows(sqlite_db, updated_ids)
+        update_embedding_store(sqlite_db)
+    refresh_catalog_snapshot(sqlite_db)
+    logger.info(
+        f"Ingested {totals['files'] - totals['failed']} of {totals['files']} files: {totals['inserted']} inserted, "
+        f"{totals['updated']} updated, {totals['unchanged']} unchanged, {totals['rejected']} rejected."
+    )
+    return {'files': sorted(summaries, key=lambda s: s['file']), 'totals': totals, 'write_errors': write_errors}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a directory of supplier price lists into the catalog.")
+    parser.add_argument('directory', help="Folder containing supplier workbooks")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    parser.add_argument('--profiles', default=None, help="Column-mapping profiles JSON file")
+    parser.add_argument('--workers', type=int, default=None, help="Number of parser processes")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    report = ingest_directory(args.directory, args.db, profiles_path=args.profiles, workers=args.workers)
+    for summary in report['files']:
+        status = summary['error'] or (
+            f"{summary['inserted']} inserted, {summary['updated']} updated, "
+            f"{summary['unchanged']} unchanged, {summary['rejected']} rejected"
+        )
+        print(f"{summary['file']}: {status}")
+
+if __name__ == "__main__":
+    main()
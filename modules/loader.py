@@ -1,24 +1,89 @@
+import os
+import csv
 import pandas as pd
-import sqlite3
+import numpy as np
+import queue
+from contextlib import contextmanager
 from difflib import get_close_matches
+from itertools import chain, islice
 import logging
+from modules.catalog import make_item_key, upsert_catalog_rows
+from modules.storage import open_catalog
+from modules.embeddings import embedding_store_path, update_embedding_store, refresh_embedding_rows
+from modules.snapshot import refresh_catalog_snapshot
+from modules.metrics import stage_timer, count
+
+# Rows read, validated and inserted per batch when streaming a price list
+DEFAULT_CHUNK_SIZE = 5000
+REQUIRED_COLUMNS = ('Item Name', 'Description', 'Cost Price')
+# Mapped when a matching column exists, never prompted for
+OPTIONAL_COLUMNS = ('Category',)
+# Number of rejected row numbers kept in the load summary
+MAX_REPORTED_REJECTS = 20
 
 def connect_sqlite_db(sqlite_db: str):
     """
-    Connects to a SQLite database and returns the connection object.
+    Connects to a SQLite database and returns the connection object, configured and with its schema migrated
+    to the current version (see modules.storage).
     Raises an error with a clear message if the connection fails.
     """
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     try:
-        logger.info(f"Connecting to SQLite database: {sqlite_db}")
-        conn = sqlite3.connect(sqlite_db)
-        logger.info("Database connection opened.")
-        return conn
+        logger.debug(f"Connecting to SQLite database: {sqlite_db}")
+        return open_catalog(sqlite_db)
     except Exception as e:
         logger.error(f"Error connecting to SQLite database: {e}")
         raise RuntimeError(f"Error connecting to SQLite database: {e}")
 
+def open_readonly_connection(sqlite_db: str):
+    """
+    Opens a read-only connection to an existing SQLite database, usable from any thread.
+    Raises RuntimeError if the database file does not exist.
+    """
+    return open_catalog(sqlite_db, readonly=True, check_same_thread=False)
+
+class ConnectionPool:
+    """
+    A fixed-size pool of read-only connections to one SQLite database.
+    With the database in WAL mode the pooled readers run concurrently with each other and with a writer, so
+    request handlers check a connection out instead of serialising on a single shared one.
+    The schema must already be prepared (the connections cannot create tables, indexes or triggers).
+    """
+
+    def __init__(self, sqlite_db: str, size: int = 4):
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1.")
+        self.sqlite_db = sqlite_db
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(open_readonly_connection(sqlite_db))
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Checks a connection out for the duration of a with block, waiting up to timeout seconds for one to be
+        returned when all are in use. Raises RuntimeError on timeout.
+        """
+        try:
+            conn = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No database connection available within {timeout} seconds.")
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """
+        Closes the idle connections of the pool.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 def map_excel_columns(excel_file: str):
     """
     Reads the first row of the Excel file, displays column names, and prompts the user to map columns for
@@ -70,42 +135,149 @@ def is_valid_row(row, cost_price_col):
     """
     value = row[cost_price_col]
     if pd.isna(value) or value <= 0:
-        logging.warning(f"Invalid cost price detected: {value}")
         return False
     return True
 
-def load_excel_with_column_mapping(excel_file: str, sqlite_db: str):
+def open_sheet_stream(data_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
     """
-    Loads data from an Excel file into a SQLite database table named 'items'.
-    
+    Opens a supplier price list for streaming, reading the file only once.
+
     Purpose:
-        - Reads the Excel file and allows the user to map columns if the required names differ.
-        - Validates the 'Cost Price' column for missing or invalid values (must be > 0).
-        - Skips rows with invalid cost price and prints an error message for each.
-        - Creates the 'items' table in the SQLite database if it does not exist.
-        - Inserts valid rows into the database using bulk insert for performance.
-    
+        - .xlsx/.xlsm files are read row by row with openpyxl in read-only mode.
+        - .csv files are read with the chunked pandas CSV reader.
+        - .parquet files are read batch by batch with pyarrow (optional dependency).
+        - Other formats (e.g. legacy .xls) fall back to pandas.read_excel and are sliced into chunks.
+
     Args:
-        excel_file (str): Path to the Excel file to be loaded. The file should contain columns for item name, description, and cost price (names can be mapped interactively).
-        sqlite_db (str): Path to the SQLite database file where the data will be inserted.
-    
+        data_file (str): Path to the file. The first row (or the schema) provides the column names.
+        chunk_size (int, optional): Number of data rows per chunk.
+
     Returns:
-        None on success. Prints error messages for invalid rows or mapping issues. Raises exceptions for connection errors.
+        tuple: (columns, chunks) where columns is the list of column names and chunks is an iterator of
+        DataFrames with at most chunk_size rows each.
     """
-    logger = logging.getLogger(__name__)
-    required = {
-        'Item Name': None,
-        'Description': None,
-        'Cost Price': None
-    }
-    df = pd.read_excel(excel_file)
-    columns = list(df.columns)
+    ext = os.path.splitext(data_file)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(data_file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(header)]
 
-    # Try to auto-map columns using fuzzy matching
+        def chunks():
+            try:
+                while True:
+                    block = list(islice(rows, chunk_size))
+                    if not block:
+                        break
+                    yield pd.DataFrame([r[:len(columns)] for r in block], columns=columns)
+            finally:
+                workbook.close()
+        return columns, chunks()
+    if ext == '.csv':
+        reader = pd.read_csv(data_file, chunksize=chunk_size)
+        first = next(reader, None)
+        if first is None:
+            return list(pd.read_csv(data_file, nrows=0).columns), iter(())
+        return list(first.columns), chain([first], reader)
+    if ext == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(f"Reading Parquet files requires pyarrow: {e}")
+        parquet_file = pq.ParquetFile(data_file)
+        columns = list(parquet_file.schema_arrow.names)
+        return columns, (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunk_size))
+    df = pd.read_excel(data_file)
+    return list(df.columns), (df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size))
+
+def validate_chunk(chunk, mapping: dict):
+    """
+    Validates the cost prices of a chunk in one vectorised pass.
+
+    Args:
+        chunk (DataFrame): Rows read from the source file.
+        mapping (dict): Maps 'Item Name', 'Description' and 'Cost Price' to source column names.
+
+    Returns:
+        tuple: (rows, rejected) where rows is a list of (item_name, description, cost_price) tuples for valid rows
+        and rejected is a boolean mask (numpy array) of rows whose cost price is missing, non-numeric or <= 0.
+    """
+    cost = pd.to_numeric(chunk[mapping['Cost Price']], errors='coerce')
+    valid = (cost > 0).to_numpy()
+    names = chunk[mapping['Item Name']].to_numpy(dtype=object)[valid]
+    descriptions = chunk[mapping['Description']].to_numpy(dtype=object)[valid]
+    rows = [
+        (None if pd.isna(name) else name, None if pd.isna(desc) else desc, price)
+        for name, desc, price in zip(names, descriptions, cost.to_numpy(dtype=float)[valid].tolist())
+    ]
+    return rows, ~valid
+
+def keyed_chunk_rows(chunk, mapping: dict, key_column: str = None, source: str = None):
+    """
+    Validates a chunk and attaches a stable item key, qualified by source if one is given, to every valid row.
+    Rows without a usable key cannot be synchronised and are rejected alongside invalid cost prices.
+
+    Returns:
+        tuple: (rows, rejected) where rows is a list of (item_key, item_name, description, cost_price, category)
+        tuples (category is None unless mapping has a 'Category' column) and rejected is a boolean mask of the
+        rejected rows of the chunk.
+    """
+    rows, rejected = validate_chunk(chunk, mapping)
+    if key_column is None:
+        keys = [make_item_key(name, source) for name, _, _ in rows]
+    else:
+        raw_keys = chunk[key_column].to_numpy(dtype=object)[~rejected]
+        keys = [make_item_key(None if pd.isna(k) else k, source) for k in raw_keys]
+    if mapping.get('Category'):
+        raw_categories = chunk[mapping['Category']].to_numpy(dtype=object)[~rejected]
+        categories = [None if pd.isna(c) else str(c).strip() or None for c in raw_categories]
+    else:
+        categories = [None] * len(rows)
+    keyless = [i for i, key in enumerate(keys) if key is None]
+    if keyless:
+        rejected[np.flatnonzero(~rejected)[keyless]] = True
+    keyed = [(key,) + row + (category,) for key, row, category in zip(keys, rows, categories) if key is not None]
+    return keyed, rejected
+
+def record_rejected_rows(summary: dict, rejected, first_row: int):
+    """
+    Adds the rejected rows of a chunk to a load summary's 'rejected' count and 'rejected_rows' sample.
+    first_row is the spreadsheet row number of the chunk's first row. Returns the chunk's rejected row numbers.
+    """
+    row_numbers = (np.flatnonzero(rejected) + first_row).tolist()
+    summary['rejected'] += len(row_numbers)
+    count('rows_rejected', len(row_numbers))
+    room = MAX_REPORTED_REJECTS - len(summary['rejected_rows'])
+    summary['rejected_rows'].extend(row_numbers[:room])
+    return row_numbers
+
+def auto_map_columns(columns: list, required=REQUIRED_COLUMNS, optional=OPTIONAL_COLUMNS):
+    """
+    Maps the required fields to source columns by exact or fuzzy name matching, without prompting.
+    Returns a dict mapping each required field (by default 'Item Name', 'Description' and 'Cost Price') to a
+    column name, or None if not found. Optional fields (by default 'Category') are included only when a
+    matching column exists.
+    """
+    mapping = {}
     for req in required:
         match = get_close_matches(req, columns, n=1, cutoff=0.7)
-        if match:
-            required[req] = match[0]
+        mapping[req] = match[0] if match else None
+    for opt in optional:
+        match = get_close_matches(opt, columns, n=1, cutoff=0.8)
+        if match and match[0] not in mapping.values():
+            mapping[opt] = match[0]
+    return mapping
+
+def resolve_column_mapping(columns: list, required=REQUIRED_COLUMNS, optional=OPTIONAL_COLUMNS):
+    """
+    Maps the required fields to source columns, using fuzzy matching and prompting the user for any left over.
+    Returns a dict mapping the required fields (by default 'Item Name', 'Description' and 'Cost Price') and any
+    optional fields found to column names.
+    """
+    logger = logging.getLogger(__name__)
+    # Try to auto-map columns using fuzzy matching
+    required = auto_map_columns(columns, required, optional)
 
     # Prompt user for any unmapped columns
     for req in required:
@@ -119,46 +291,135 @@ def load_excel_with_column_mapping(excel_file: str, sqlite_db: str):
                 print("Invalid column name. Try again.")
                 user_col = input(f"Please enter the column name to use for '{req}': ")
             required[req] = user_col
+    return required
+
+def load_excel_with_column_mapping(excel_file: str, sqlite_db: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                   reject_report: str = None):
+    """
+    Loads data from an Excel file into the 'items_master' catalog.
+    
+    Purpose:
+        - Streams the file row by row (Excel, CSV or Parquet) so memory stays bounded regardless of its size.
+        - Allows the user to map columns if the required names differ.
+        - Validates the 'Cost Price' column per chunk for missing or invalid values (must be > 0).
+        - Skips rows with invalid cost price and collects them in a summary instead of logging each one.
+        - Upserts valid rows by item name within the file's source (see sync_excel_catalog), so loading the
+          same file twice does not duplicate the catalog.
+    
+    Args:
+        excel_file (str): Path to the Excel file to be loaded. The file should contain columns for item name, description, and cost price (names can be mapped interactively).
+        sqlite_db (str): Path to the SQLite database file where the data will be inserted.
+        chunk_size (int, optional): Number of rows read, validated and inserted per batch.
+        reject_report (str, optional): Path of a CSV file listing every rejected row (row number and cost price).
+    
+    Returns:
+        dict: Summary with 'inserted', 'updated', 'unchanged', 'removed' and 'rejected' counts and
+        'rejected_rows', the first few rejected row numbers.
+        Raises exceptions for connection errors.
+    """
+    logger = logging.getLogger(__name__)
+    summary = sync_excel_catalog(excel_file, sqlite_db, chunk_size=chunk_size, reject_report=reject_report)
+    if not summary['inserted'] + summary['updated'] + summary['unchanged']:
+        logger.warning("No valid rows to insert into 'items_master' table.")
+    if summary['rejected']:
+        logger.warning(
+            f"Skipped {summary['rejected']} rows with invalid cost price "
+            f"(first rows: {summary['rejected_rows']})"
+            + (f"; full list in {reject_report}." if reject_report else ".")
+        )
+        print(f"Skipped {summary['rejected']} rows with invalid cost price.")
+    return summary
+
+def sync_excel_catalog(excel_file: str, sqlite_db: str, key_column: str = None, soft_delete: bool = False,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, reject_report: str = None, source: str = None):
+    """
+    Synchronises the 'items_master' catalog with a supplier price list instead of appending to it.
+
+    Purpose:
+        - Identifies each row by a stable item key: the key_column value (e.g. an SKU) or the normalised item name,
+          qualified by the file's source, so same-named items of different suppliers stay separate.
+        - Compares a content hash per row, so unchanged rows are skipped and only changed rows are updated.
+        - Optionally soft-deletes (is_active = 0) catalog rows of the same source whose key no longer appears
+          in the file; other suppliers' rows are never touched.
+        - Applies all changes in batches inside a single transaction, then refreshes the embedding store
+          (if one exists) for the rows that moved; the full-text index follows through its triggers.
+
+    Args:
+        excel_file (str): Path to the price list (Excel, CSV or Parquet).
+        sqlite_db (str): Path to the SQLite database file.
+        key_column (str, optional): Source column holding a stable item identifier. Defaults to the item name.
+        soft_delete (bool, optional): Deactivate catalog rows missing from the file. Defaults to False.
+        chunk_size (int, optional): Number of rows read, validated and written per batch.
+        reject_report (str, optional): Path of a CSV file listing every rejected row (row number and cost price).
+        source (str, optional): Supplier the price list belongs to. Defaults to the file name without its
+            extension, so pass it explicitly when a supplier's file is renamed between syncs.
+
+    Returns:
+        dict: Counts of 'inserted', 'updated', 'unchanged', 'removed' and 'rejected' rows, plus 'rejected_rows'.
+        Raises ValueError if key_column is not a column of the file or source is empty.
+    """
+    logger = logging.getLogger(__name__)
+    columns, chunks = open_sheet_stream(excel_file, chunk_size)
+    if key_column is not None and key_column not in columns:
+        raise ValueError(f"Key column '{key_column}' not found. Available columns: {columns}")
+    mapping = resolve_column_mapping(columns)
+    source = make_item_key(os.path.splitext(os.path.basename(excel_file))[0] if source is None else source)
+    if source is None:
+        raise ValueError("The source of a price list cannot be empty.")
 
-    # Connect to SQLite and create table if needed
     conn = connect_sqlite_db(sqlite_db)
     cursor = conn.cursor()
-    logger.info("Database connection established for loading Excel data.")
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_name TEXT,
-            description TEXT,
-            cost_price REAL
-        )
-    ''')
-    logger.info("Ensured 'items' table exists.")
-
-    # Prepare valid rows for bulk insert
-    rows_to_insert = []
-    for idx, row in df.iterrows():
-        if not is_valid_row(row, required['Cost Price']):
-            logger.warning(f"Invalid cost price in row {idx + 2}: {row[required['Cost Price']]}. Skipping row.")
-            print(f"Invalid cost price in row {idx + 2}: {row[required['Cost Price']]}. Skipping row.")
-            continue
-        rows_to_insert.append(
-            (
-                row[required['Item Name']],
-                row[required['Description']],
-                row[required['Cost Price']]
+    summary = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'rejected': 0, 'rejected_rows': []}
+    updated_ids = []
+    report = open(reject_report, 'w', newline='') if reject_report else None
+    report_writer = csv.writer(report) if report else None
+    if report_writer:
+        report_writer.writerow(['Row', mapping['Cost Price']])
+    try:
+        if soft_delete:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS sync_seen (item_key TEXT PRIMARY KEY)')
+            cursor.execute('DELETE FROM sync_seen')
+        first_row = 2
+        for chunk in chunks:
+            with stage_timer('load_chunk'):
+                keyed, rejected = keyed_chunk_rows(chunk, mapping, key_column, source)
+                if keyed:
+                    counts = upsert_catalog_rows(cursor, keyed, source)
+                    for name in ('inserted', 'updated', 'unchanged'):
+                        summary[name] += counts[name]
+                    updated_ids.extend(counts['updated_ids'])
+                    if soft_delete:
+                        cursor.executemany('INSERT OR IGNORE INTO sync_seen (item_key) VALUES (?)',
+                                           [(r[0],) for r in keyed])
+            count('rows_loaded', len(keyed))
+            row_numbers = record_rejected_rows(summary, rejected, first_row)
+            if row_numbers and report_writer:
+                report_writer.writerows(zip(row_numbers, chunk[mapping['Cost Price']].to_numpy()[rejected]))
+            first_row += len(chunk)
+        if soft_delete:
+            cursor.execute(
+                'UPDATE items_master SET is_active = 0 WHERE source = ? AND is_active = 1 '
+                'AND item_key NOT IN (SELECT item_key FROM sync_seen)',
+                (source,)
             )
-        )
-    if rows_to_insert:
-        cursor.executemany(
-            'INSERT INTO items (item_name, description, cost_price) VALUES (?, ?, ?)',
-            rows_to_insert
-        )
-        logger.info(f"Inserted {len(rows_to_insert)} valid rows into 'items' table.")
-    else:
-        logger.warning("No valid rows to insert into 'items' table.")
-    conn.commit()
-    conn.close()
-    logger.info("Database connection closed after loading Excel data.")
+            summary['removed'] = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if report:
+            report.close()
+        conn.close()
+    logger.info(
+        f"Catalog sync of {excel_file}: {summary['inserted']} inserted, {summary['updated']} updated, "
+        f"{summary['unchanged']} unchanged, {summary['removed']} removed, {summary['rejected']} rejected."
+    )
+    if os.path.isdir(embedding_store_path(sqlite_db)):
+        refresh_embedding_rows(sqlite_db, updated_ids)
+        update_embedding_store(sqlite_db)
+    refresh_catalog_snapshot(sqlite_db)
+    return summary
 
 def create_items_master_table(sqlite_db: str, column_mapping: dict = None):
     """
@@ -166,37 +427,22 @@ def create_items_master_table(sqlite_db: str, column_mapping: dict = None):
     
     Purpose:
         - Establishes a connection to the specified SQLite database.
-        - Creates a table named 'items_master' with columns: id (primary key), item_name (text), description (text), and cost_price (real).
-        - Allows for custom column names by providing a column_mapping dictionary that maps logical names ('item_name', 'description', 'cost_price') to actual column names.
+        - Brings its schema up to date (see modules.storage): the 'items_master' table with columns id (primary
+          key), item_key, item_name, description, cost_price, category, content_hash and is_active, plus the
+          full-text search index used by the matcher.
     
     Args:
         sqlite_db (str): Path to the SQLite database file.
-        column_mapping (dict, optional): Dictionary mapping logical column names to custom column names. Defaults to None (uses standard names).
+        column_mapping (dict, optional): Kept for compatibility; only the standard logical column names
+            ('item_name', 'description', 'cost_price') are supported. Map source columns when loading instead.
     
     Returns:
-        None. Raises an exception if the database connection fails.
+        None. Raises ValueError for custom column names and an exception if the database connection fails.
     """
-    logger = logging.getLogger(__name__)
-    logical_names = {
-        'item_name': 'item_name',
-        'description': 'description',
-        'cost_price': 'cost_price'
-    }
-    if column_mapping:
-        logical_names.update(column_mapping)
-
-    conn = connect_sqlite_db(sqlite_db)
-    cursor = conn.cursor()
-    logger.info("Database connection established for creating 'items_master' table.")
-    cursor.execute(f'''
-        CREATE TABLE IF NOT EXISTS items_master (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            {logical_names['item_name']} TEXT,
-            {logical_names['description']} TEXT,
-            {logical_names['cost_price']} REAL
+    custom = {logical: name for logical, name in (column_mapping or {}).items() if logical != name}
+    if custom:
+        raise ValueError(
+            f"Custom 'items_master' column names are not supported: {custom}. "
+            "Map source columns to the standard names when loading instead."
         )
-    ''')
-    logger.info("Ensured 'items_master' table exists.")
-    conn.commit()
-    conn.close()
-    logger.info("Database connection closed after creating 'items_master' table.")
+    connect_sqlite_db(sqlite_db).close()
@@ -1,67 +1,557 @@
-import sqlite3
-import re
+import os
+import heapq
+import threading
+from contextlib import nullcontext
+from itertools import chain, islice
+import json
+import math
 import logging
-from modules.pricing import calculate_selling_price
+import numpy as np
+from modules.pricing import NO_RULES, load_pricing_rules, apply_pricing_rules
+from modules.search_index import FTS_TABLE, extract_keywords, build_match_query
+from modules.catalog import catalog_version
+from modules.storage import open_catalog
+from modules.cache import LRUCache
+from modules.embeddings import embedding_store_path, search_embeddings
+from modules.snapshot import load_catalog_snapshot
+from modules.fuzzy import load_term_index, expand_keywords
+from modules.metrics import stage_timer, count, counted
 
-def recommend_items_for_tender(sqlite_db: str, requirements: str, profit_margin_percent: float):
+# BM25 column weights for (item_name, description): a hit in the name counts double
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+# Semantic search always scores the whole catalog, so without an explicit top_k keep this many hits
+SEMANTIC_DEFAULT_TOP_K = 50
+MATCH_MODES = ('keyword', 'semantic', 'snapshot')
+# Items recommended per tender line in line-item mode
+DEFAULT_LINE_TOP_K = 3
+# Number of distinct (requirements, catalog version, options) match sets kept in memory
+MATCH_CACHE_SIZE = 256
+
+_match_cache = LRUCache(MATCH_CACHE_SIZE)
+_connections = {}
+_connections_lock = threading.Lock()
+
+def rank_candidates(rows, top_k=None, offset=0, profit_weight=0.0):
+    """
+    Ranks (item_name, description, cost_price, category, relevance) rows by relevance, optionally blended with margin.
+    With profit_weight > 0 the score becomes relevance + profit_weight * log(1 + cost_price); under a flat
+    margin the absolute profit is proportional to cost, so this favours more profitable items without
+    depending on the margin itself.
+    When top_k is given only offset + top_k candidates are kept in a bounded heap, so the full match list is
+    never built or sorted.
+    Returns a list of (score, item_name, description, cost_price, category) tuples, best first.
+    """
+    scored = (
+        (relevance + profit_weight * math.log1p(cost_price) if profit_weight else relevance,
+         item_name, description, cost_price, category)
+        for item_name, description, cost_price, category, relevance in rows
+    )
+    if top_k is None:
+        ranked = sorted(scored, key=lambda r: r[0], reverse=True)
+    else:
+        ranked = heapq.nlargest(offset + top_k, scored, key=lambda r: r[0])
+    return ranked[offset:]
+
+def get_catalog_connection(sqlite_db: str):
+    """
+    Returns the matcher's persistent connection to a database together with the lock guarding it.
+    The connection is opened and prepared once per database, instead of on every recommendation.
+    """
+    logger = logging.getLogger(__name__)
+    path = os.path.abspath(sqlite_db)
+    with _connections_lock:
+        entry = _connections.get(path)
+        if entry is None:
+            if not os.path.exists(path):
+                raise RuntimeError(f"Database file not found: {sqlite_db}")
+            logger.info(f"Connecting to SQLite database: {sqlite_db}")
+            conn = open_catalog(path, check_same_thread=False)
+            entry = _connections[path] = (conn, threading.Lock())
+        return entry
+
+def close_catalog_connections():
+    """
+    Closes the matcher's persistent connections and clears the match cache.
+    """
+    with _connections_lock:
+        for conn, _ in _connections.values():
+            conn.close()
+        _connections.clear()
+    _match_cache.clear()
+
+def keyword_candidates(cursor, keywords, order_by_rank: bool = False):
+    """
+    Looks up items matching any requirement keyword in the full-text index.
+    Returns an iterable of (item_name, description, cost_price, category, relevance) rows, where relevance is the
+    BM25 score; with order_by_rank the rows come best first.
+    Soft-deleted items, and items without a positive numeric cost price, are filtered out.
+    """
+    match_query = build_match_query(keywords)
+    if match_query is None:
+        logging.getLogger(__name__).warning("No searchable keywords in requirements.")
+        return []
+    # bm25() is lower-is-better, so negate it into a relevance score
+    query = f"""
+        SELECT m.item_name, m.description, m.cost_price, m.category,
+               -bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})
+        FROM {FTS_TABLE} JOIN items_master AS m ON m.rowid = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ?
+          AND m.is_active = 1 AND typeof(m.cost_price) IN ('integer', 'real') AND m.cost_price > 0
+    """
+    if order_by_rank:
+        query += " ORDER BY 5 DESC, m.rowid"
+    cursor.execute(query, (match_query,))
+    return cursor
+
+def semantic_candidates(cursor, sqlite_db: str, requirements: str, limit: int, backend: str = None):
+    """
+    Looks up the items whose embeddings are most similar to the requirements.
+    The embedding store is only read: catalog writers (loader, ingest, dbgen) keep it up to date, and rows added
+    by any other means are found once it is refreshed (python -m modules.embeddings).
+    Returns a list of (item_name, description, cost_price, category, relevance) rows, where relevance is the cosine
+    similarity.
+    backend is the embedding backend the caller expects; None accepts the store's own.
+    Raises RuntimeError if the database has no embedding store and ValueError if backend differs from its backend.
+    """
+    if not os.path.isdir(embedding_store_path(sqlite_db)):
+        raise RuntimeError(f"No embedding store for {sqlite_db}; build it with "
+                           f"'python -m modules.embeddings --db {sqlite_db}'.")
+    similarity = dict(search_embeddings(sqlite_db, requirements, limit, backend))
+    if not similarity:
+        return []
+    cursor.execute("""
+        SELECT rowid, item_name, description, cost_price, category FROM items_master
+        WHERE rowid IN (SELECT value FROM json_each(?))
+          AND is_active = 1 AND typeof(cost_price) IN ('integer', 'real') AND cost_price > 0
+    """, (json.dumps(list(similarity)),))
+    return [(name, desc, cost, category, similarity[rowid]) for rowid, name, desc, cost, category in cursor.fetchall()]
+
+def snapshot_candidates(snapshot, keywords, limit: int = None, profit_weight: float = 0.0):
+    """
+    Looks up items containing any requirement keyword as a substring of their name or description, scanning the
+    pre-lowercased columns of a catalog snapshot instead of querying SQLite.
+    Scores are computed and ordered as arrays (blended with profit_weight as in rank_candidates), and only the
+    best limit rows are decoded, lazily, so large hit sets cost no per-item Python work.
+    Returns an iterator of (item_name, description, cost_price, category, relevance) rows, best first, where
+    relevance weighs each keyword found in the name by NAME_WEIGHT and each one found in the description by
+    DESCRIPTION_WEIGHT. Items without a positive cost price are filtered out.
+    """
+    relevance = np.zeros(len(snapshot))
+    for keyword in keywords:
+        relevance[snapshot.rows_containing('item_name_lower', keyword)] += NAME_WEIGHT
+        relevance[snapshot.rows_containing('description_lower', keyword)] += DESCRIPTION_WEIGHT
+    hits = np.flatnonzero((relevance > 0) & (snapshot.costs > 0))
+    scores = relevance[hits]
+    if profit_weight:
+        scores = scores + profit_weight * np.log1p(snapshot.costs[hits])
+    # Stable descending order, so ties keep catalog order like the other modes
+    hits = hits[np.argsort(-scores, kind='stable')][:limit]
+    return (
+        (snapshot.text('item_name', i), snapshot.text('description', i), float(snapshot.costs[i]),
+         snapshot.text('category', i) or None, float(relevance[i]))
+        for i in hits.tolist()
+    )
+
+def match_items(sqlite_db: str, requirements: str, top_k: int = None, offset: int = 0, profit_weight: float = 0.0,
+                mode: str = 'keyword', embedding_backend: str = None, conn=None, fuzzy: bool = False):
+    """
+    Finds and ranks the catalog items matching a requirements statement, without pricing them.
+    Results are cached per normalised keyword set and catalog version, so repeated requirements skip the
+    database entirely until the catalog changes. Raises on database errors.
+    With fuzzy, misspelt keywords are first expanded to their closest catalog terms (see modules.fuzzy).
+    conn is an already prepared connection owned by the caller (e.g. one checked out of a ConnectionPool);
+    without one the matcher's shared connection is used, serialised by its lock.
+    Returns a tuple of (score, item_name, description, cost_price, category) tuples, best first.
+    """
+    logger = logging.getLogger(__name__)
+    keywords = extract_keywords(requirements)
+    if conn is None:
+        conn, lock = get_catalog_connection(sqlite_db)
+    else:
+        lock = nullcontext()
+    path = os.path.abspath(sqlite_db)
+    with lock:
+        version = catalog_version(conn)
+        # Keyword and snapshot scores ignore keyword order; embeddings of the query text may not
+        normalized = tuple(keywords) if mode == 'semantic' else tuple(sorted(keywords))
+        key = (path, version, mode, embedding_backend if mode == 'semantic' else None,
+               normalized, top_k, offset, profit_weight, fuzzy)
+        ranked = _match_cache.get(key)
+        if ranked is not None:
+            return ranked
+        # Entries for older catalog versions of this database can never be hit again
+        _match_cache.discard_where(lambda k: k[0] == path and k[1] != version)
+        cursor = conn.cursor()
+        # 'match' covers the whole lookup and ranking, 'query' only the index lookup that starts it
+        with stage_timer('match'):
+            if fuzzy:
+                with stage_timer('expand'):
+                    keywords = expand_keywords(load_term_index(sqlite_db, conn), keywords)
+            logger.debug(f"Extracted keywords for matching: {keywords}")
+            with stage_timer('query'):
+                if mode == 'semantic':
+                    limit = offset + (SEMANTIC_DEFAULT_TOP_K if top_k is None else top_k)
+                    candidates = semantic_candidates(cursor, sqlite_db, ' '.join(keywords), limit, embedding_backend)
+                elif mode == 'snapshot':
+                    limit = None if top_k is None else offset + top_k
+                    candidates = snapshot_candidates(load_catalog_snapshot(sqlite_db, conn), keywords, limit,
+                                                     profit_weight)
+                else:
+                    # Candidate lookup goes through the full-text index, so cost grows with hits, not catalog size
+                    candidates = keyword_candidates(cursor, keywords)
+            ranked = tuple(rank_candidates(counted(candidates, 'rows_scanned'), top_k=top_k, offset=offset,
+                                           profit_weight=profit_weight))
+        count('rows_matched', len(ranked))
+        _match_cache.put(key, ranked)
+        return ranked
+
+def iter_recommended_items(sqlite_db: str, requirements: str, profit_margin_percent: float, chunk_size: int = 1000,
+                           mode: str = 'keyword', embedding_backend: str = None,
+                           use_pricing_rules: bool = True, fuzzy: bool = False):
+    """
+    Streams recommended items chunk by chunk, for tenders too large to hold in memory at once.
+    Matches are read lazily from a dedicated cursor in relevance order (SQLite sorts them in bounded memory)
+    and each chunk is priced as it is read. Items are the same dicts recommend_items_for_tender returns.
+    Args:
+        sqlite_db (str): Path to the SQLite database file.
+        requirements (str): Statement of requirements (keywords, categories, specs).
+        profit_margin_percent (float): Desired profit margin percentage.
+        chunk_size (int, optional): Number of items fetched and priced per chunk.
+        mode (str, optional): 'keyword' (default), 'semantic' or 'snapshot'.
+        embedding_backend (str, optional): Embedding backend expected in semantic mode. Defaults to None (the
+            store's backend); any other backend is an error.
+        use_pricing_rules (bool, optional): Apply the database's pricing rules. Defaults to True.
+        fuzzy (bool, optional): Expand misspelt keywords to their closest catalog terms. Defaults to False.
+    Yields:
+        list of dict: Up to chunk_size priced items, best matches first. Raises on database errors.
+    """
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Unknown matching mode '{mode}'. Use one of {MATCH_MODES}.")
+    keywords = extract_keywords(requirements or '')
+    shared_conn, lock = get_catalog_connection(sqlite_db)
+    rules = NO_RULES
+    if use_pricing_rules:
+        with lock:
+            rules = load_pricing_rules(shared_conn, os.path.abspath(sqlite_db))
+    # A private connection keeps a slow consumer from holding the shared connection's lock
+    conn = open_catalog(sqlite_db)
+    try:
+        if fuzzy:
+            keywords = expand_keywords(load_term_index(sqlite_db, conn), keywords)
+        cursor = conn.cursor()
+        if mode == 'semantic':
+            rows = semantic_candidates(cursor, sqlite_db, ' '.join(keywords), SEMANTIC_DEFAULT_TOP_K,
+                                       embedding_backend)
+            rows.sort(key=lambda r: r[4], reverse=True)
+            rows = iter(rows)
+        elif mode == 'snapshot':
+            rows = snapshot_candidates(load_catalog_snapshot(sqlite_db, conn), keywords)
+        else:
+            rows = keyword_candidates(cursor, keywords, order_by_rank=True)
+        rows = counted(rows, 'rows_scanned')
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with stage_timer('price'):
+                prices, margins, valid = apply_pricing_rules(
+                    rules, [row[2] for row in chunk], profit_margin_percent, categories=[row[3] for row in chunk]
+                )
+            count('rows_priced', int(valid.sum()))
+            yield [
+                {
+                    'item_name': item_name,
+                    'description': description,
+                    'category': category,
+                    'cost_price': cost_price,
+                    'suggested_selling_price': float(price),
+                    'profit_margin_percent': float(margin),
+                    'match_score': score
+                }
+                for (item_name, description, cost_price, category, score), price, margin, ok
+                in zip(chunk, prices, margins, valid) if ok
+            ]
+    finally:
+        conn.close()
+
+def clear_match_cache():
+    """
+    Empties the match cache, keeping connections open (e.g. to measure uncached matching).
+    """
+    _match_cache.clear()
+
+def match_cache_info() -> dict:
+    """
+    Returns the size and hit/miss/eviction counters of the match cache.
+    """
+    return _match_cache.info()
+
+def recommend_items_for_tender(sqlite_db: str, requirements: str, profit_margin_percent: float,
+                               top_k: int = None, offset: int = 0, profit_weight: float = 0.0,
+                               mode: str = 'keyword', embedding_backend: str = None,
+                               use_pricing_rules: bool = True, conn=None, fuzzy: bool = False):
     """
     Recommends items for a tender based on requirements and desired profit margin.
+    In 'keyword' mode items are ranked by BM25 relevance of the requirement keywords against item name and
+    description; in 'semantic' mode they are ranked by embedding similarity, so related wording also matches;
+    in 'snapshot' mode keywords are matched as substrings against the memory-mapped catalog snapshot, which must
+    be current (see modules.snapshot).
+    Matching does not depend on the margin, so the (cached) match set is priced on every call.
     Args:
         sqlite_db (str): Path to the SQLite database file.
         requirements (str): Statement of requirements (keywords, categories, specs).
         profit_margin_percent (float): Desired profit margin percentage.
+        top_k (int, optional): Maximum number of items to return. Defaults to None (all matches).
+        offset (int, optional): Number of best-ranked items to skip, for pagination. Defaults to 0.
+        profit_weight (float, optional): Weight of the margin term blended into the relevance score. Defaults to 0.
+        mode (str, optional): 'keyword' (default), 'semantic' or 'snapshot'.
+        embedding_backend (str, optional): Embedding backend expected in semantic mode. Defaults to None (the
+            store's backend); any other backend is an error.
+        use_pricing_rules (bool, optional): Apply the database's pricing rules (category and cost-band margins,
+            rounding) on top of the desired margin. Defaults to True.
+        conn (sqlite3.Connection, optional): Prepared connection to use instead of the matcher's shared one.
+        fuzzy (bool, optional): Expand misspelt requirement keywords (e.g. 'survelliance') to their closest
+            catalog terms before matching. Defaults to False.
     Returns:
-        list of dict: Recommended items with description, cost price, and suggested selling price.
+        list of dict: Recommended items with description, category, cost price, suggested selling price,
+        the margin applied and match score.
         Or a string error message if a database error occurs.
     """
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     if not requirements or not requirements.strip():
         logger.warning("No requirements provided, cannot proceed with item recommendation.")
         return "No requirements provided, cannot proceed with item recommendation."
+    if (top_k is not None and top_k < 0) or offset < 0:
+        logger.warning("top_k and offset must not be negative.")
+        return "top_k and offset must not be negative."
+    if mode not in MATCH_MODES:
+        logger.warning(f"Unknown matching mode: {mode}")
+        return f"Unknown matching mode '{mode}'. Use one of {MATCH_MODES}."
     try:
-        logger.info(f"Connecting to SQLite database: {sqlite_db}")
-        conn = sqlite3.connect(sqlite_db)
+        ranked = match_items(sqlite_db, requirements, top_k=top_k, offset=offset, profit_weight=profit_weight,
+                             mode=mode, embedding_backend=embedding_backend, conn=conn, fuzzy=fuzzy)
+        rules = NO_RULES
+        if use_pricing_rules:
+            if conn is None:
+                conn, lock = get_catalog_connection(sqlite_db)
+            else:
+                lock = nullcontext()
+            with lock:
+                rules = load_pricing_rules(conn, os.path.abspath(sqlite_db))
+    except Exception as e:
+        logger.error(f"Error fetching items from the database: {e}")
+        return f"Error fetching items from the database: {e}"
+    with stage_timer('price'):
+        prices, margins, valid = apply_pricing_rules(
+            rules, [row[3] for row in ranked], profit_margin_percent, categories=[row[4] for row in ranked]
+        )
+    recommended = [
+        {
+            'item_name': item_name,
+            'description': description,
+            'category': category,
+            'cost_price': cost_price,
+            'suggested_selling_price': float(price),
+            'profit_margin_percent': float(margin),
+            'match_score': score
+        }
+        for (score, item_name, description, cost_price, category), price, margin, ok
+        in zip(ranked, prices, margins, valid) if ok
+    ]
+    count('rows_priced', len(recommended))
+    logger.debug(f"Matched {len(recommended)} items for requirements: {requirements}")
+    return recommended
+
+def line_item_hits(cursor, tokens):
+    """
+    Looks up the items matching any of tokens in the full-text index, and which tokens each item contains.
+    Membership comes from the index itself, one prefix query per token and column, so it follows the FTS
+    tokenizer exactly (words split on '_' and punctuation, accents folded) as keyword mode does.
+    Returns (rows, hit_rows, hit_tokens, hit_weights): rows are the (item_name, description, cost_price,
+    category) of the matched items in catalog order; the three arrays list every (row, token) pair with its
+    field weight (NAME_WEIGHT for a name hit plus DESCRIPTION_WEIGHT for a description hit).
+    Soft-deleted items, and items without a positive numeric cost price, are filtered out.
+    """
+    hit_rowids, hit_tokens, hit_weights = [], [], []
+    for token_id, token in enumerate(tokens):
+        match_query = build_match_query([token])
+        if match_query is None:
+            continue
+        for column, weight in (('item_name', NAME_WEIGHT), ('description', DESCRIPTION_WEIGHT)):
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?",
+                           (f'{{{column}}} : {match_query}',))
+            rowids = np.fromiter((rowid for (rowid,) in cursor), dtype=np.int64)
+            hit_rowids.append(rowids)
+            hit_tokens.append(np.full(len(rowids), token_id, dtype=np.int64))
+            hit_weights.append(np.full(len(rowids), weight))
+    if not hit_rowids:
+        return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    hit_rowids, hit_tokens = np.concatenate(hit_rowids), np.concatenate(hit_tokens)
+    # One entry per (row, token), with the name and description weights summed
+    pairs, inverse = np.unique(hit_rowids * len(tokens) + hit_tokens, return_inverse=True)
+    hit_weights = np.bincount(inverse, weights=np.concatenate(hit_weights))
+    hit_rowids, hit_tokens = pairs // len(tokens), pairs % len(tokens)
+    cursor.execute("""
+        SELECT rowid, item_name, description, cost_price, category FROM items_master
+        WHERE rowid IN (SELECT value FROM json_each(?))
+          AND is_active = 1 AND typeof(cost_price) IN ('integer', 'real') AND cost_price > 0
+        ORDER BY rowid
+    """, (json.dumps(np.unique(hit_rowids).tolist()),))
+    fetched = cursor.fetchall()
+    count('rows_scanned', len(fetched))
+    if not fetched:
+        return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    # Map the hits to positions in rows, dropping those of filtered-out items
+    row_ids = np.fromiter((row[0] for row in fetched), dtype=np.int64, count=len(fetched))
+    positions = np.searchsorted(row_ids, hit_rowids)
+    kept = (positions < len(row_ids)) & (row_ids[np.minimum(positions, len(row_ids) - 1)] == hit_rowids)
+    return [row[1:] for row in fetched], positions[kept], hit_tokens[kept], hit_weights[kept]
+
+def match_line_items(sqlite_db: str, lines, top_k: int = DEFAULT_LINE_TOP_K, fuzzy: bool = False, conn=None):
+    """
+    Matches every line item of a tender against the catalog in one batched pass.
+
+    Purpose:
+        - Tokenises all lines once and looks each distinct keyword up in the full-text index once per field
+          (item name and description), so a 2,000-line bill of quantities costs two index lookups per keyword
+          instead of one query per line.
+        - Scores each (line, item) pair as the sum, over the line's keywords found in the item, of the field
+          weight times the keyword's BM25 inverse document frequency, and keeps the best top_k items per line.
+        - Lines with the same keywords share their result.
+
+    Args:
+        sqlite_db (str): Path to the SQLite database file.
+        lines (list of dict): Line items with a 'requirements' string (see modules.tender_lines).
+        top_k (int, optional): Number of items kept per line. Defaults to DEFAULT_LINE_TOP_K.
+        fuzzy (bool, optional): Expand misspelt keywords to their closest catalog terms first.
+        conn (sqlite3.Connection, optional): Prepared connection to use instead of the matcher's shared one.
+
+    Returns:
+        list of list of tuple: For each line, up to top_k (score, item_name, description, cost_price, category)
+        tuples, best first. Raises on database errors.
+    """
+    logger = logging.getLogger(__name__)
+    if conn is None:
+        conn, lock = get_catalog_connection(sqlite_db)
+    else:
+        lock = nullcontext()
+    line_keywords = [extract_keywords(line.get('requirements') or '') for line in lines]
+    with lock, stage_timer('match'):
+        if fuzzy:
+            with stage_timer('expand'):
+                index = load_term_index(sqlite_db, conn)
+                expansions = {kw: expand_keywords(index, [kw]) for kw in set(chain.from_iterable(line_keywords))}
+                line_keywords = [list(dict.fromkeys(chain.from_iterable(expansions[kw] for kw in keywords)))
+                                 for keywords in line_keywords]
+        tokens = list(dict.fromkeys(chain.from_iterable(line_keywords)))
         cursor = conn.cursor()
-        # Create indices to improve search performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_master_item_name ON items_master(item_name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_master_description ON items_master(description)')
-        logger.info("Database indices ensured on item_name and description.")
-        # Improved keyword extraction using regex to ignore punctuation
-        keywords = re.findall(r'\w+', requirements.lower())
-        logger.info(f"Extracted keywords for matching: {keywords}")
-        query = """
-            SELECT item_name, description, cost_price FROM items_master
-        """
-        cursor.execute(query)
-        items = cursor.fetchall()
-        recommended = []
-        for item_name, description, cost_price in items:
-            name_l = item_name.lower() if item_name else ''
-            desc_l = description.lower() if description else ''
-            if any(kw in name_l or kw in desc_l for kw in keywords):
-                # Validate cost_price is a positive float
-                try:
-                    if cost_price is None or not isinstance(cost_price, (int, float)) or cost_price <= 0:
-                        logger.warning(f"Skipping item '{item_name}' due to invalid cost_price: {cost_price}")
-                        continue
-                    selling_price = calculate_selling_price(cost_price, profit_margin_percent)
-                    recommended.append({
-                        'item_name': item_name,
-                        'description': description,
-                        'cost_price': cost_price,
-                        'suggested_selling_price': selling_price,
-                        'profit_margin_percent': profit_margin_percent
-                    })
-                    logger.info(f"Recommended item: {item_name} (Cost: {cost_price}, Selling: {selling_price})")
-                except Exception as e:
-                    logger.error(f"Error calculating selling price for item '{item_name}': {e}")
-        logger.info(f"Matched {len(recommended)} items for requirements: {requirements}")
-        # Sort by profit margin (highest first)
-        recommended.sort(key=lambda x: x['suggested_selling_price'] - x['cost_price'], reverse=True)
-        conn.close()
-        logger.info("Database connection closed.")
-        return recommended
+        with stage_timer('query'):
+            rows, hit_rows, hit_tokens, hit_weights = line_item_hits(cursor, tokens)
+            catalog_size = cursor.execute('SELECT COUNT(*) FROM items_master WHERE is_active = 1').fetchone()[0]
+        # Group the (row, token) pairs into one posting list per token, weighted by the token's idf
+        doc_freq = np.bincount(hit_tokens, minlength=len(tokens))
+        idf = np.log1p((catalog_size - doc_freq + 0.5) / (doc_freq + 0.5))
+        order = np.argsort(hit_tokens, kind='stable')
+        posting_rows = hit_rows[order]
+        posting_scores = (hit_weights * idf[hit_tokens])[order]
+        bounds = np.concatenate(([0], np.cumsum(doc_freq)))
+        token_ids = {token: i for i, token in enumerate(tokens)}
+        results, by_keywords = [], {}
+        # Scores of the current line, accumulated in place; each posting list holds a row at most once
+        line_scores = np.zeros(len(rows))
+        for keywords in line_keywords:
+            key = tuple(sorted(keywords))
+            ranked = by_keywords.get(key)
+            if ranked is None:
+                ids = [token_ids[kw] for kw in key if kw.strip('_')]
+                ranked = []
+                touched = np.concatenate([posting_rows[bounds[i]:bounds[i + 1]] for i in ids]
+                                         or [np.empty(0, dtype=np.int64)])
+                if touched.size:
+                    for i in ids:
+                        line_scores[posting_rows[bounds[i]:bounds[i + 1]]] += posting_scores[bounds[i]:bounds[i + 1]]
+                    # A row appears once per keyword, so the best top_k * len(ids) entries hold the top_k rows
+                    candidates, keep = touched, top_k * len(ids)
+                    if touched.size > keep:
+                        scores = line_scores[touched]
+                        threshold = np.partition(scores, touched.size - keep)[touched.size - keep]
+                        candidates = touched[scores >= threshold]
+                    candidates = np.unique(candidates)
+                    scores = line_scores[candidates]
+                    # Best score first; ties keep catalog order like the other modes
+                    for i in np.lexsort((candidates, -scores))[:top_k].tolist():
+                        ranked.append((float(scores[i]),) + rows[candidates[i]])
+                    line_scores[touched] = 0.0
+                by_keywords[key] = ranked
+            results.append(ranked)
+    count('rows_matched', sum(len(r) for r in results))
+    logger.debug(f"Matched {len(lines)} line items ({len(by_keywords)} distinct) with {len(tokens)} keywords "
+                 f"over {len(rows)} catalog hits.")
+    return results
+
+def recommend_line_items(sqlite_db: str, lines, profit_margin_percent: float, top_k: int = DEFAULT_LINE_TOP_K,
+                         fuzzy: bool = False, use_pricing_rules: bool = True, conn=None):
+    """
+    Recommends the best top_k catalog items for every line item of a tender and prices them for its quantity.
+    Lines are matched in one batched pass (see match_line_items) and all recommendations are priced in one
+    vectorised call, with the line quantity feeding the quantity-break rules.
+    Args:
+        sqlite_db (str): Path to the SQLite database file.
+        lines (list of dict): Line items with 'line', 'requirements' and 'quantity' (see modules.tender_lines).
+        profit_margin_percent (float): Desired profit margin percentage.
+        top_k (int, optional): Number of items recommended per line. Defaults to DEFAULT_LINE_TOP_K.
+        fuzzy (bool, optional): Expand misspelt keywords to their closest catalog terms. Defaults to False.
+        use_pricing_rules (bool, optional): Apply the database's pricing rules. Defaults to True.
+        conn (sqlite3.Connection, optional): Prepared connection to use instead of the matcher's shared one.
+    Returns:
+        list of dict: One entry per line with its 'line', 'requirements' and 'quantity' and 'items', the
+        recommended items (the dicts recommend_items_for_tender returns), best first.
+        Or a string error message if a database error occurs.
+    """
+    logger = logging.getLogger(__name__)
+    if not lines:
+        logger.warning("No line items provided, cannot proceed with item recommendation.")
+        return "No line items provided, cannot proceed with item recommendation."
+    if top_k < 1:
+        logger.warning("top_k must be at least 1.")
+        return "top_k must be at least 1."
+    try:
+        matches = match_line_items(sqlite_db, lines, top_k=top_k, fuzzy=fuzzy, conn=conn)
+        rules = NO_RULES
+        if use_pricing_rules:
+            if conn is None:
+                conn, lock = get_catalog_connection(sqlite_db)
+            else:
+                lock = nullcontext()
+            with lock:
+                rules = load_pricing_rules(conn, os.path.abspath(sqlite_db))
     except Exception as e:
         logger.error(f"Error fetching items from the database: {e}")
-        return f"Error fetching items from the database: {e}"
\ No newline at end of file
+        return f"Error fetching items from the database: {e}"
+    ranked = list(chain.from_iterable(matches))
+    quantities = [line['quantity'] for line, line_matches in zip(lines, matches) for _ in line_matches]
+    with stage_timer('price'):
+        prices, margins, valid = apply_pricing_rules(
+            rules, [row[3] for row in ranked], profit_margin_percent, categories=[row[4] for row in ranked],
+            quantities=quantities
+        )
+    priced = iter(zip(prices.tolist(), margins.tolist(), valid.tolist()))
+    recommended = []
+    for line, line_matches in zip(lines, matches):
+        items = []
+        for (score, item_name, description, cost_price, category), (price, margin, ok) in zip(line_matches, priced):
+            if ok:
+                items.append({
+                    'item_name': item_name,
+                    'description': description,
+                    'category': category,
+                    'cost_price': cost_price,
+                    'suggested_selling_price': price,
+                    'profit_margin_percent': margin,
+                    'match_score': score
+                })
+        recommended.append({'line': line['line'], 'requirements': line['requirements'],
+                            'quantity': line['quantity'], 'items': items})
+    count('rows_priced', len(ranked))
+    return recommended
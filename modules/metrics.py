@@ -0,0 +1,240 @@
+import os
+import io
+import time
+import bisect
+import pstats
+import cProfile
+import datetime
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (seconds) of the stage timer histogram buckets; the last bucket is unbounded
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Set to 1 to collect metrics from start-up; entry points may also call enable_metrics()
+METRICS_ENV = 'TENDERPILOT_METRICS'
+# Number of functions and allocation sites kept in a request profile
+PROFILE_TOP = 25
+
+class Histogram:
+    """
+    A fixed-bucket histogram of durations, as exported to Prometheus.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """
+        Estimates a quantile as the upper bound of the bucket holding it (None if empty or in the last bucket).
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return None
+
+class MetricsRegistry:
+    """
+    Stage timers (histograms) and counters shared by the pipeline.
+    While disabled, timer() returns a shared no-op context manager and increment() returns at once, so
+    instrumented code pays one attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def _timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timer(self, stage: str):
+        """
+        Returns a context manager recording the duration of its block under stage.
+        """
+        if not self.enabled:
+            return _NO_TIMER
+        return self._timed(stage)
+
+    def increment(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current metrics as plain data: {'timers': {stage: {...}}, 'counters': {name: value}}.
+        Timer entries hold 'count', 'sum_seconds', bucket 'p50_seconds'/'p95_seconds'/'p99_seconds' estimates and
+        cumulative 'buckets' keyed by upper bound.
+        """
+        with self._lock:
+            timers = {}
+            for stage, histogram in self._histograms.items():
+                cumulative, buckets = 0, {}
+                for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += bucket_count
+                    buckets[str(bound)] = cumulative
+                timers[stage] = {
+                    'count': histogram.count,
+                    'sum_seconds': histogram.sum,
+                    'p50_seconds': histogram.quantile(0.5),
+                    'p95_seconds': histogram.quantile(0.95),
+                    'p99_seconds': histogram.quantile(0.99),
+                    'buckets': buckets,
+                }
+            return {'timers': timers, 'counters': dict(self._counters)}
+
+    def to_prometheus(self, prefix: str = 'tenderpilot') -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        data = self.snapshot()
+        lines = [f'# TYPE {prefix}_stage_seconds histogram']
+        for stage, timer in sorted(data['timers'].items()):
+            for bound, cumulative in timer['buckets'].items():
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {timer["sum_seconds"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {timer["count"]}')
+        for name, value in sorted(data['counters'].items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+_NO_TIMER = nullcontext()
+registry = MetricsRegistry(enabled=os.environ.get(METRICS_ENV, '') not in ('', '0'))
+# tracemalloc and the profiler hooks are process-wide, so profiled requests run one at a time
+_profile_lock = threading.Lock()
+
+def enable_metrics(enabled: bool = True):
+    """
+    Turns metric collection on or off for the whole process.
+    """
+    registry.enabled = enabled
+
+def stage_timer(stage: str):
+    """
+    Times a pipeline stage ('connect', 'query', 'match', 'price', 'write_xlsx', ...) as a with block.
+    """
+    return registry.timer(stage)
+
+def count(name: str, value: int = 1):
+    """
+    Adds value to a counter ('rows_scanned', 'rows_matched', 'rows_rejected', ...).
+    """
+    registry.increment(name, value)
+
+def counted(rows, name: str):
+    """
+    Returns rows unchanged while metrics are disabled; otherwise an iterator over rows that adds the number of
+    rows consumed to counter name once it is exhausted or closed.
+    """
+    if not registry.enabled:
+        return rows
+    return _count_rows(rows, name)
+
+def _count_rows(rows, name):
+    consumed = 0
+    try:
+        for row in rows:
+            consumed += 1
+            yield row
+    finally:
+        registry.increment(name, consumed)
+
+def metrics_snapshot() -> dict:
+    """
+    Returns the collected stage timers and counters as plain data (see MetricsRegistry.snapshot).
+    """
+    return registry.snapshot()
+
+def export_prometheus() -> str:
+    """
+    Returns the collected metrics in the Prometheus text exposition format.
+    """
+    return registry.to_prometheus()
+
+def reset_metrics():
+    """
+    Clears all collected timers and counters.
+    """
+    registry.reset()
+
+@contextmanager
+def profile_request(label: str, output_dir: str = None, memory: bool = True):
+    """
+    Profiles one request with cProfile and, optionally, tracemalloc, for diagnosing a slow tender.
+    Profiled blocks are serialised process-wide: a second one waits until the first exits, so each report's peak
+    memory and allocations belong to its own request. Unprofiled requests are not held up.
+
+    Args:
+        label (str): Name of the request, used in the report and the profile file name.
+        output_dir (str, optional): Folder to save the raw cProfile stats to ('<label>-<timestamp>.prof'),
+            for viewing in tools such as snakeviz.
+        memory (bool, optional): Also trace memory allocations. Defaults to True.
+
+    Yields:
+        dict: Filled in when the block exits with 'label', 'seconds', 'profile' (the top functions by
+        cumulative time, as text), 'peak_memory_bytes' and 'top_allocations', and 'profile_file' if saved.
+    """
+    with _profile_lock:
+        report = {'label': label}
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif memory and hasattr(tracemalloc, 'reset_peak'):
+            # Python 3.9+; on 3.8 the peak of an already running trace may predate this request
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            report['seconds'] = time.perf_counter() - start
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                report['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                report['top_allocations'] = [str(stat) for stat in snapshot.statistics('lineno')[:PROFILE_TOP]]
+                if started_tracing:
+                    tracemalloc.stop()
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            report['profile'] = text.getvalue()
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+                stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+                safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)
+                report['profile_file'] = os.path.join(output_dir, f'{safe_label}-{stamp}.prof')
+                profiler.dump_stats(report['profile_file'])
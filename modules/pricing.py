@@ -1,4 +1,8 @@
 import logging
+import threading
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
 
 def calculate_selling_price(cost_price: float, profit_margin_percent: float) -> float:
     """
@@ -12,11 +16,54 @@ def calculate_selling_price(cost_price: float, profit_margin_percent: float) ->
         ValueError: If cost_price is less than or equal to zero.
     """
     if cost_price <= 0:
-        logging.error("Cost price must be a positive number.")
         raise ValueError("Cost price must be a positive number.")
-    selling_price = cost_price * (1 + profit_margin_percent / 100)
-    logging.info(f"Calculated selling price: {selling_price} (Cost: {cost_price}, Margin: {profit_margin_percent}%)")
-    return selling_price
+    return cost_price * (1 + profit_margin_percent / 100)
+
+def price_matrix(cost_prices, profit_margin_percents):
+    """
+    Calculates selling prices for many items at one or many profit margins in a single vectorised pass.
+    Args:
+        cost_prices (array-like): Cost prices of the items; missing or non-numeric values count as invalid.
+        profit_margin_percents (float or array-like): One margin, or several margins to compare side by side.
+    Returns:
+        tuple: (prices, valid) where prices is an (items, margins) float array with NaN rows for invalid items,
+        and valid is a boolean mask of the items whose cost price is a positive number.
+    """
+    try:
+        costs = np.asarray(cost_prices, dtype=float).reshape(-1)
+    except (TypeError, ValueError):
+        costs = pd.to_numeric(pd.Series(list(cost_prices), dtype=object), errors='coerce').to_numpy(dtype=float)
+    margins = np.atleast_1d(np.asarray(profit_margin_percents, dtype=float))
+    valid = costs > 0
+    prices = np.where(valid[:, None], costs[:, None] * (1 + margins[None, :] / 100), np.nan)
+    return prices, valid
+
+def price_grid(items, profit_margin_percents):
+    """
+    Builds a what-if grid comparing the selling price of each item at several profit margins.
+    Args:
+        items (list of dict): Items with 'item_name', 'description' and 'cost_price'.
+        profit_margin_percents (array-like): Margins to compare, e.g. [5, 10, 15, 20].
+    Returns:
+        DataFrame: One row per item with a valid cost price: item name, description, cost price and
+        one 'Price @ <margin>%' column per margin.
+    """
+    margins = list(np.atleast_1d(profit_margin_percents))
+    grid = pd.DataFrame({
+        'Item Name': [item.get('item_name') for item in items],
+        'Description': [item.get('description') for item in items],
+        'Cost Price': [item.get('cost_price') for item in items],
+    })
+    prices, valid = price_matrix(grid['Cost Price'], margins)
+    for col, margin in enumerate(margins):
+        grid[margin_column_name(margin)] = prices[:, col]
+    return grid[valid].reset_index(drop=True)
+
+def margin_column_name(profit_margin_percent) -> str:
+    """
+    Returns the what-if column header for a margin, e.g. 'Price @ 15%'.
+    """
+    return f"Price @ {float(profit_margin_percent):g}%"
 
 def suggest_items_with_pricing(items, requirements, profit_margin_percent):
     """
@@ -28,24 +75,185 @@ def suggest_items_with_pricing(items, requirements, profit_margin_percent):
     Returns:
         list of dict: Suggested items with their selling prices and profit margins.
     """
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     req_keywords = set(word.lower() for word in requirements.split())
-    suggested = []
-    for item in items:
-        name = item.get('name', '').lower()
-        desc = item.get('description', '').lower()
-        if any(keyword in name or keyword in desc for keyword in req_keywords):
-            try:
-                selling_price = calculate_selling_price(item['cost_price'], profit_margin_percent)
-                suggested.append({
-                    'name': item['name'],
-                    'description': item['description'],
-                    'cost_price': item['cost_price'],
-                    'profit_margin_percent': profit_margin_percent,
-                    'selling_price': selling_price
-                })
-                logger.info(f"Recommended item: {item['name']} (Cost: {item['cost_price']}, Selling: {selling_price})")
-            except Exception as e:
-                logger.error(f"Error recommending item '{item['name']}': {e}")
-    return suggested
\ No newline at end of file
+    matched = [
+        item for item in items
+        if any(keyword in item.get('name', '').lower() or keyword in item.get('description', '').lower()
+               for keyword in req_keywords)
+    ]
+    prices, valid = price_matrix([item.get('cost_price') for item in matched], profit_margin_percent)
+    if not valid.all():
+        skipped = [item.get('name') for item, ok in zip(matched, valid) if not ok]
+        logger.error(f"Skipped {len(skipped)} items with invalid cost price: {skipped[:10]}")
+    suggested = [
+        {
+            'name': item['name'],
+            'description': item['description'],
+            'cost_price': item['cost_price'],
+            'profit_margin_percent': profit_margin_percent,
+            'selling_price': float(price)
+        }
+        for item, price, ok in zip(matched, prices[:, 0], valid) if ok
+    ]
+    logger.debug(f"Recommended {len(suggested)} items.")
+    return suggested
+
+RULE_TYPES = ('category', 'cost_band', 'quantity_break', 'rounding')
+
+# Compiled rule tables per database, reused until the rules version changes
+_compiled_rules = {}
+_compiled_rules_lock = threading.Lock()
+
+class PricingRules(NamedTuple):
+    """
+    Pricing rules compiled into lookup tables.
+    category_margins maps lowercased categories to margins; band_bounds/band_margins and qty_bounds/qty_discounts
+    are ascending lower bounds with the margin or discount that applies from each bound upwards.
+    """
+    category_margins: dict
+    band_bounds: np.ndarray
+    band_margins: np.ndarray
+    qty_bounds: np.ndarray
+    qty_discounts: np.ndarray
+    round_to: float
+
+NO_RULES = PricingRules({}, np.empty(0), np.empty(0), np.empty(0), np.empty(0), 0.0)
+
+def ensure_pricing_rules_table(conn):
+    """
+    Creates the 'pricing_rules' table and the triggers that bump its version on every change.
+
+    Rule types:
+        - 'category': items whose category equals `category` use margin `value` (percent).
+        - 'cost_band': items whose cost price is at least `min_value` use margin `value`, up to the next band.
+        - 'quantity_break': lines of at least `min_value` units get a discount of `value` percent.
+        - 'rounding': selling prices are rounded up to a multiple of `value` (e.g. 1 or 0.05).
+    A category rule takes precedence over a cost band; items matching neither use the requested margin.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'pricing_rules_version_ai'")
+    if cursor.fetchone():
+        return
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS pricing_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rule_type TEXT NOT NULL CHECK (rule_type IN {RULE_TYPES}),
+            category TEXT,
+            min_value REAL,
+            value REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('pricing_rules_version', 0)")
+    for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS pricing_rules_version_{suffix} AFTER {event} ON pricing_rules BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = 'pricing_rules_version';
+            END
+        ''')
+    conn.commit()
+
+def add_pricing_rule(sqlite_db: str, rule_type: str, value: float, category: str = None, min_value: float = None):
+    """
+    Stores a pricing rule (see ensure_pricing_rules_table for the rule types), through a configured and
+    migrated catalog connection.
+    Raises ValueError if the rule is incomplete.
+    """
+    # modules.storage imports this module for its migrations, so open_catalog is imported here
+    from modules.storage import open_catalog
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown pricing rule type '{rule_type}'. Use one of {RULE_TYPES}.")
+    if rule_type == 'category' and not category:
+        raise ValueError("A category rule needs a category.")
+    if rule_type in ('cost_band', 'quantity_break') and min_value is None:
+        raise ValueError(f"A {rule_type} rule needs a min_value.")
+    if rule_type == 'rounding' and value <= 0:
+        raise ValueError("A rounding rule needs a positive step.")
+    conn = open_catalog(sqlite_db)
+    try:
+        conn.execute(
+            'INSERT INTO pricing_rules (rule_type, category, min_value, value) VALUES (?, ?, ?, ?)',
+            (rule_type, category, min_value, value)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def compile_pricing_rules(rows) -> PricingRules:
+    """
+    Compiles (rule_type, category, min_value, value) rows into lookup tables. Later rows win on duplicates.
+    """
+    category_margins, bands, breaks, round_to = {}, {}, {}, 0.0
+    for rule_type, category, min_value, value in rows:
+        if rule_type == 'category':
+            category_margins[str(category).strip().lower()] = value
+        elif rule_type == 'cost_band':
+            bands[min_value] = value
+        elif rule_type == 'quantity_break':
+            breaks[min_value] = value
+        elif rule_type == 'rounding':
+            round_to = value
+    band_bounds = np.array(sorted(bands), dtype=float)
+    qty_bounds = np.array(sorted(breaks), dtype=float)
+    return PricingRules(
+        category_margins,
+        band_bounds, np.array([bands[b] for b in band_bounds], dtype=float),
+        qty_bounds, np.array([breaks[b] for b in qty_bounds], dtype=float),
+        round_to
+    )
+
+def load_pricing_rules(conn, cache_key: str = None) -> PricingRules:
+    """
+    Returns the compiled pricing rules of a database, recompiling only when the rules changed.
+    cache_key identifies the database (its path); without one the rules are compiled on every call.
+    """
+    ensure_pricing_rules_table(conn)
+    version = conn.execute("SELECT value FROM catalog_meta WHERE key = 'pricing_rules_version'").fetchone()[0]
+    with _compiled_rules_lock:
+        cached = _compiled_rules.get(cache_key)
+        if cache_key is not None and cached is not None and cached[0] == version:
+            return cached[1]
+    rules = compile_pricing_rules(
+        conn.execute('SELECT rule_type, category, min_value, value FROM pricing_rules ORDER BY id')
+    )
+    if cache_key is not None:
+        with _compiled_rules_lock:
+            _compiled_rules[cache_key] = (version, rules)
+    return rules
+
+def apply_pricing_rules(rules: PricingRules, cost_prices, profit_margin_percent: float, categories=None,
+                        quantities=None):
+    """
+    Prices a whole recommendation set under the pricing rules in one vectorised pass.
+    Args:
+        rules (PricingRules): Compiled rules (see load_pricing_rules); NO_RULES gives flat-margin pricing.
+        cost_prices (array-like): Cost prices of the items.
+        profit_margin_percent (float): Margin for items no category or cost-band rule applies to.
+        categories (array-like, optional): Category of each item.
+        quantities (int or array-like, optional): Quantity per item, for quantity breaks. Defaults to 1.
+    Returns:
+        tuple: (prices, margins, valid) arrays: selling prices (NaN for invalid items), the margin applied to each
+        item before discounts and rounding, and the mask of items with a positive cost price.
+    """
+    prices, valid = price_matrix(cost_prices, 0)
+    costs = prices[:, 0]
+    margins = np.full(len(costs), float(profit_margin_percent))
+    if rules.band_bounds.size:
+        band = np.searchsorted(rules.band_bounds, costs, side='right') - 1
+        in_band = valid & (band >= 0)
+        margins[in_band] = rules.band_margins[band[in_band]]
+    if rules.category_margins and categories is not None:
+        lowered = pd.Series(list(categories), dtype=object).str.strip().str.lower()
+        category_margin = lowered.map(rules.category_margins).to_numpy(dtype=float)
+        margins = np.where(np.isnan(category_margin), margins, category_margin)
+    prices = costs * (1 + margins / 100)
+    if rules.qty_bounds.size and quantities is not None:
+        qty = np.broadcast_to(np.asarray(quantities, dtype=float), costs.shape)
+        tier = np.searchsorted(rules.qty_bounds, qty, side='right') - 1
+        discount = np.where(tier >= 0, rules.qty_discounts[np.maximum(tier, 0)], 0.0)
+        prices = prices * (1 - discount / 100)
+    if rules.round_to:
+        # The small tolerance keeps prices that are already on a step from being bumped up by float noise
+        prices = np.ceil(prices / rules.round_to - 1e-9) * rules.round_to
+    return prices, margins, valid
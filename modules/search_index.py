@@ -0,0 +1,124 @@
+import re
+import logging
+
+FTS_TABLE = 'items_fts'
+# fts5vocab view of the terms in the full-text index, one row per distinct term
+VOCAB_TABLE = 'items_vocab'
+WORD_PATTERN = re.compile(r'\w+')
+
+def ensure_search_index(conn):
+    """
+    Ensures the full-text inverted index over items_master exists and is kept in sync.
+
+    Purpose:
+        - Creates an FTS5 virtual table 'items_fts' that indexes item_name and description of 'items_master'.
+        - Creates triggers so every insert, update and delete on 'items_master' also updates the index, and
+          restores them if the table was rebuilt.
+        - Populates the index from the existing catalog the first time it is created.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to a database that contains the 'items_master' table.
+
+    Returns:
+        bool: True if the index was created (and built) by this call, False if it already existed.
+    """
+    logger = logging.getLogger(__name__)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+    if cursor.fetchone():
+        # Rebuilding 'items_master' drops its triggers; the index itself survives as long as rowids are kept
+        create_search_triggers(cursor)
+        conn.commit()
+        return False
+    logger.info("Building full-text search index over 'items_master'.")
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            item_name,
+            description,
+            content='items_master',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    create_search_triggers(cursor)
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+    logger.info("Full-text search index built.")
+    return True
+
+def create_search_triggers(cursor):
+    """
+    Creates the triggers that keep the full-text index in step with 'items_master', if missing.
+    """
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS items_master_fts_ai AFTER INSERT ON items_master BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.rowid, new.item_name, new.description);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS items_master_fts_ad AFTER DELETE ON items_master BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.rowid, old.item_name, old.description);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS items_master_fts_au AFTER UPDATE ON items_master BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, description)
+            VALUES ('delete', old.rowid, old.item_name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, item_name, description)
+            VALUES (new.rowid, new.item_name, new.description);
+        END
+    ''')
+
+def ensure_search_vocabulary(conn):
+    """
+    Creates the 'items_vocab' table listing every term of the full-text index with the number of items
+    containing it. It is a live view of the index, so it never needs rebuilding.
+    """
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, 'row')")
+    conn.commit()
+
+def ensure_vocabulary_version(conn):
+    """
+    Ensures 'catalog_meta' carries a vocabulary version counter that only moves when the indexed text can have
+    changed: inserts, deletes and updates that change item_name or description. Price, status and source
+    updates leave it alone, so caches built from the vocabulary survive them.
+    """
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('vocabulary_version', 0)")
+    for suffix, event in (('ai', 'INSERT'), ('ad', 'DELETE'), ('au', 'UPDATE OF item_name, description')):
+        condition = ('WHEN old.item_name IS NOT new.item_name OR old.description IS NOT new.description'
+                     if suffix == 'au' else '')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS items_master_vocabulary_{suffix} AFTER {event} ON items_master {condition}
+            BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = 'vocabulary_version';
+            END
+        ''')
+    conn.commit()
+
+def vocabulary_version(conn) -> int:
+    """
+    Returns the current vocabulary version (see ensure_vocabulary_version).
+    """
+    return conn.execute("SELECT value FROM catalog_meta WHERE key = 'vocabulary_version'").fetchone()[0]
+
+def extract_keywords(requirements: str):
+    """
+    Splits a requirements statement into lowercase keywords, ignoring punctuation and duplicates.
+    Returns a list of keywords in the order they first appear.
+    """
+    return list(dict.fromkeys(WORD_PATTERN.findall(requirements.lower())))
+
+def build_match_query(keywords):
+    """
+    Builds an FTS5 MATCH expression that hits any row containing a word starting with one of the keywords.
+    Returns None if there are no keywords to search for.
+    """
+    terms = [f'"{kw}"*' for kw in keywords if kw.strip('_')]
+    if not terms:
+        return None
+    return ' OR '.join(terms)
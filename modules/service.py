@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import uuid
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.loader import ConnectionPool
+from modules.storage import open_catalog
+from modules.embeddings import update_embedding_store
+from modules.snapshot import refresh_catalog_snapshot
+from modules.matcher import MATCH_MODES, recommend_items_for_tender
+from modules.pricing import NO_RULES, load_pricing_rules, apply_pricing_rules, price_matrix
+from modules.generator import generate_tender_excel
+from modules.batch import tender_output_paths
+from modules.metrics import enable_metrics, metrics_snapshot, export_prometheus, profile_request
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 4
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 10 * 1024 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class ServiceError(Exception):
+    """
+    A request error reported to the client with the given HTTP status.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def parse_recommend_request(payload: dict):
+    """
+    Validates the JSON body of a recommend or generate request.
+    Returns (requirements, margin, options), where options are keyword arguments for recommend_items_for_tender.
+    Raises ServiceError(400) for missing or invalid fields.
+    """
+    requirements = payload.get('requirements')
+    if not isinstance(requirements, str) or not requirements.strip():
+        raise ServiceError(400, "'requirements' must be a non-empty string.")
+    try:
+        margin = float(payload.get('margin', payload.get('profit_margin_percent')))
+    except (TypeError, ValueError):
+        raise ServiceError(400, "'margin' must be a number.")
+    mode = payload.get('mode', 'keyword')
+    if mode not in MATCH_MODES:
+        raise ServiceError(400, f"'mode' must be one of {MATCH_MODES}.")
+    options = {'mode': mode}
+    for field in ('top_k', 'offset'):
+        if payload.get(field) is not None:
+            try:
+                options[field] = int(payload[field])
+            except (TypeError, ValueError):
+                raise ServiceError(400, f"'{field}' must be an integer.")
+    if payload.get('profit_weight') is not None:
+        try:
+            options['profit_weight'] = float(payload['profit_weight'])
+        except (TypeError, ValueError):
+            raise ServiceError(400, "'profit_weight' must be a number.")
+    if payload.get('fuzzy') is not None:
+        if not isinstance(payload['fuzzy'], bool):
+            raise ServiceError(400, "'fuzzy' must be true or false.")
+        options['fuzzy'] = payload['fuzzy']
+    return requirements, margin, options
+
+class TenderService:
+    """
+    Serves recommend, price and generate requests over HTTP/1.1 with JSON bodies.
+
+    The catalog is prepared and warmed once at start-up: the schema, search index and pricing rules are
+    checked with a single writable connection, the database is switched to WAL mode, the embedding store for
+    semantic mode is built or brought up to date, and a bounded pool of read-only connections is opened for the
+    request handlers. Requests never write, so semantic requests only read the embedding store. Matching and
+    pricing run on a thread pool sized to the connection pool; workbooks are written in a process pool so that
+    large tenders do not stall the event loop or the matcher threads.
+
+    Endpoints:
+        - GET  /health: {'status': 'ok'}.
+        - POST /recommend: {'requirements', 'margin', optional 'top_k', 'offset', 'profit_weight', 'mode'}
+          -> {'items': [...]}.
+        - POST /price: {'cost_prices': [...], 'margin' or 'margins': [...], optional 'categories',
+          'quantities'} -> {'prices': [...]} ('margins' gives one list of prices per item).
+        - POST /generate: the recommend fields plus optional 'tender_id' and 'what_if_margins'
+          -> {'output_file', 'items'}.
+        - GET  /metrics: stage timers and counters as JSON; /metrics/prometheus in the Prometheus text format.
+    With allow_profiling, a POST body with "profile": true runs that request under cProfile and tracemalloc and
+    adds the report to the response as 'profile' (for /generate, the matching and pricing part).
+    """
+
+    def __init__(self, sqlite_db: str, output_dir: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 writer_processes: int = None, allow_profiling: bool = False, profile_dir: str = None):
+        self.sqlite_db = sqlite_db
+        self.output_dir = output_dir
+        self.pool_size = pool_size
+        self.writer_processes = writer_processes
+        self.allow_profiling = allow_profiling
+        self.profile_dir = profile_dir
+        self.pool = None
+        self.threads = None
+        self.processes = None
+
+    def start(self):
+        """
+        Prepares the catalog and opens the connection pool and executors.
+        Raises RuntimeError if the database file does not exist.
+        """
+        logger = logging.getLogger(__name__)
+        if not os.path.exists(self.sqlite_db):
+            raise RuntimeError(f"Database file not found: {self.sqlite_db}")
+        # Migrating once here lets the pooled read-only connections rely on the schema
+        open_catalog(self.sqlite_db).close()
+        # Semantic and snapshot requests only read the store and the snapshot; catalog writers keep them up to
+        # date while the service runs
+        update_embedding_store(self.sqlite_db)
+        refresh_catalog_snapshot(self.sqlite_db, create=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        enable_metrics()
+        self.pool = ConnectionPool(self.sqlite_db, self.pool_size)
+        self.threads = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='tender-service')
+        self.processes = ProcessPoolExecutor(max_workers=self.writer_processes)
+        with self.pool.connection() as conn:
+            load_pricing_rules(conn, os.path.abspath(self.sqlite_db))
+        logger.info(f"Tender service ready on {self.sqlite_db} with {self.pool_size} connections.")
+
+    def close(self):
+        """
+        Shuts the executors down and closes the connection pool.
+        """
+        if self.processes is not None:
+            self.processes.shutdown()
+        if self.threads is not None:
+            self.threads.shutdown()
+        if self.pool is not None:
+            self.pool.close()
+
+    def recommend(self, payload: dict):
+        """
+        Handles a recommend request on a pooled connection. Runs on the thread pool.
+        """
+        requirements, margin, options = parse_recommend_request(payload)
+        with self.pool.connection() as conn:
+            items = recommend_items_for_tender(self.sqlite_db, requirements, margin, conn=conn, **options)
+        if isinstance(items, str):
+            raise ServiceError(400, items)
+        return {'items': items}
+
+    def price(self, payload: dict):
+        """
+        Handles a price request. Runs on the thread pool.
+        With 'margin' the database's pricing rules are applied; with 'margins' each item is priced at every
+        margin (a what-if grid) without rules. Invalid cost prices are priced as null.
+        """
+        cost_prices = payload.get('cost_prices')
+        if not isinstance(cost_prices, list):
+            raise ServiceError(400, "'cost_prices' must be a list.")
+        try:
+            if payload.get('margins') is not None:
+                prices, valid = price_matrix(cost_prices, [float(m) for m in payload['margins']])
+                return {'prices': [row if ok else None for row, ok in zip(prices.tolist(), valid.tolist())]}
+            margin = float(payload.get('margin', payload.get('profit_margin_percent')))
+        except (TypeError, ValueError):
+            raise ServiceError(400, "'margin' must be a number or 'margins' a list of numbers.")
+        rules = NO_RULES
+        if payload.get('use_pricing_rules', True):
+            with self.pool.connection() as conn:
+                rules = load_pricing_rules(conn, os.path.abspath(self.sqlite_db))
+        prices, margins, valid = apply_pricing_rules(
+            rules, cost_prices, margin, categories=payload.get('categories'), quantities=payload.get('quantities')
+        )
+        return {
+            'prices': [p if ok else None for p, ok in zip(prices.tolist(), valid.tolist())],
+            'margins': margins.tolist(),
+        }
+
+    def run_handler(self, handler, payload: dict):
+        """
+        Runs a request handler, under the profiler if the request asks for it and profiling is allowed.
+        """
+        if not payload.get('profile'):
+            return handler(payload)
+        if not self.allow_profiling:
+            raise ServiceError(400, "Profiling is disabled; start the service with --allow-profiling.")
+        with profile_request(handler.__name__, self.profile_dir) as report:
+            result = handler(payload)
+        result['profile'] = report
+        return result
+
+    async def generate(self, payload: dict):
+        """
+        Handles a generate request: matches on the thread pool, then writes the workbook in the process pool.
+        """
+        loop = asyncio.get_running_loop()
+        matched = await loop.run_in_executor(self.threads, self.run_handler, self.recommend, payload)
+        items = matched['items']
+        if not items:
+            raise ServiceError(400, "No items matched the requirements.")
+        tender_id = str(payload.get('tender_id') or 'Output')
+        output_file = tender_output_paths([f"{tender_id}_{uuid.uuid4().hex[:8]}"], self.output_dir)[0]
+        written = await loop.run_in_executor(
+            self.processes, generate_tender_excel, items, output_file, payload.get('what_if_margins')
+        )
+        if not written:
+            raise ServiceError(500, "Tender workbook could not be written.")
+        result = {'output_file': output_file, 'items': written}
+        if 'profile' in matched:
+            result['profile'] = matched['profile']
+        return result
+
+    async def dispatch(self, method: str, path: str, body: bytes):
+        """
+        Routes one request. Returns (status, JSON-serialisable payload).
+        """
+        logger = logging.getLogger(__name__)
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, metrics_snapshot()
+        if path == '/metrics/prometheus':
+            return 200, export_prometheus()
+        if path not in ('/recommend', '/price', '/generate'):
+            return 404, {'error': f"Unknown endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': f"{path} expects a POST request."}
+        try:
+            payload = json.loads(body or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            return 400, {'error': f"Invalid JSON body: {e}"}
+        loop = asyncio.get_running_loop()
+        try:
+            if path == '/generate':
+                return 200, await self.generate(payload)
+            handler = self.recommend if path == '/recommend' else self.price
+            return 200, await loop.run_in_executor(self.threads, self.run_handler, handler, payload)
+        except ServiceError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            logger.error(f"Error handling {path}: {e}")
+            return 500, {'error': f"Error handling {path}: {e}"}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves the HTTP/1.1 requests of one client connection, keeping it open between requests.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.write_response(writer, 400, {'error': "Malformed request line."}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                close = (headers.get('connection', '').lower() == 'close' or
+                         (version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive'))
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_SIZE:
+                    status = 400 if length < 0 else 413
+                    await self.write_response(writer, status, {'error': "Invalid or oversized request body."},
+                                              close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(method.upper(), target.split('?', 1)[0], body)
+                await self.write_response(writer, status, payload, close=close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, status: int, payload, close: bool = False):
+        """
+        Writes one response: JSON, or plain text if payload is a string.
+        """
+        if isinstance(payload, str):
+            data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n")
+        if close:
+            head += "Connection: close\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + data)
+        await writer.drain()
+
+async def serve(sqlite_db: str, output_dir: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                unix_socket: str = None, pool_size: int = DEFAULT_POOL_SIZE, ready=None,
+                allow_profiling: bool = False, profile_dir: str = None):
+    """
+    Runs the tender service until cancelled.
+
+    Args:
+        sqlite_db (str): Path to the SQLite database file.
+        output_dir (str): Folder for generated workbooks; created if missing.
+        host (str, optional): Interface to listen on. Defaults to localhost only.
+        port (int, optional): TCP port; 0 picks a free port.
+        unix_socket (str, optional): Listen on this Unix socket path instead of TCP.
+        pool_size (int, optional): Number of pooled read-only connections (and matcher threads).
+        ready (callable, optional): Called with the listening asyncio server once it accepts connections.
+        allow_profiling (bool, optional): Honour "profile": true in request bodies.
+        profile_dir (str, optional): Folder to save the raw cProfile stats of profiled requests to.
+    """
+    logger = logging.getLogger(__name__)
+    service = TenderService(sqlite_db, output_dir, pool_size=pool_size, allow_profiling=allow_profiling,
+                            profile_dir=profile_dir)
+    service.start()
+    try:
+        if unix_socket:
+            server = await asyncio.start_unix_server(service.handle_connection, path=unix_socket)
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+        async with server:
+            logger.info(f"Tender service listening on {unix_socket or server.sockets[0].getsockname()}")
+            if ready is not None:
+                ready(server)
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the local tender service.")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    parser.add_argument('--output-dir', default=os.path.join('data', 'tenders'), help="Folder for the workbooks")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument('--unix-socket', default=None, help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help="Pooled read-only connections")
+    parser.add_argument('--allow-profiling', action='store_true', help="Allow per-request profiling")
+    parser.add_argument('--profile-dir', default=None, help="Folder for the cProfile stats of profiled requests")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.db, args.output_dir, host=args.host, port=args.port, unix_socket=args.unix_socket,
+                          pool_size=args.pool_size, allow_profiling=args.allow_profiling,
+                          profile_dir=args.profile_dir))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
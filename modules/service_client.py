@@ -0,0 +1,30 @@
+import json
+import urllib.request
+import urllib.error
+
+# Environment variable holding the base URL of a running tender service, e.g. http://127.0.0.1:8765
+SERVICE_URL_ENV = 'TENDERPILOT_SERVICE_URL'
+
+def call_tender_service(base_url: str, endpoint: str, payload: dict, timeout: float = 60.0):
+    """
+    Posts a JSON request to the tender service (see modules.service) and returns the decoded JSON response.
+    Only the standard library is imported, so clients start without loading pandas, NumPy or xlsxwriter.
+    Raises RuntimeError with the service's error message if the request fails.
+    """
+    request = urllib.request.Request(
+        base_url.rstrip('/') + '/' + endpoint.lstrip('/'),
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('error', e.reason)
+        except ValueError:
+            message = e.reason
+        raise RuntimeError(f"Tender service error ({e.code}): {message}")
+    except urllib.error.URLError as e:
+        raise RuntimeError(f"Tender service unreachable at {base_url}: {e.reason}")
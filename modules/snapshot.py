@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import mmap
+import shutil
+import logging
+import argparse
+import threading
+from array import array
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.catalog import catalog_version
+from modules.storage import open_catalog
+
+# Text columns of a snapshot; the '_lower' ones hold the pre-lowercased search text of the item
+TEXT_FIELDS = ('item_name', 'description', 'category', 'item_name_lower', 'description_lower')
+SNAPSHOT_FORMAT = 1
+# Rows fetched from SQLite per batch while building a snapshot
+BUILD_BATCH_SIZE = 10000
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def snapshot_path(sqlite_db: str):
+    """
+    Returns the directory holding the catalog snapshots of a database, e.g. 'db/items.snapshot' for 'db/items.db'.
+    """
+    return os.path.splitext(sqlite_db)[0] + '.snapshot'
+
+def _read_current(snapshot_root):
+    try:
+        with open(os.path.join(snapshot_root, 'current.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def build_catalog_snapshot(sqlite_db: str):
+    """
+    Writes a columnar snapshot of the active catalog rows next to the database.
+
+    Layout (one 'v<catalog version>' folder per snapshot, named by 'current.json'):
+        - rowids.i64, costs.f64: item rowids and cost prices (NaN where the cost is not numeric).
+        - <field>.utf8 and <field>.off for each of TEXT_FIELDS: the UTF-8 text of every row concatenated into
+          one blob, with int64 offsets (count + 1 of them) marking where each row starts. The lowercased blobs
+          end every row with a newline, so a keyword search never runs across two rows.
+    Rows are streamed from SQLite straight into the files, and the new folder only becomes current once it is
+    complete, so readers never see a partial snapshot and old snapshots stay valid while they are mapped.
+
+    Returns:
+        dict: The snapshot metadata ('format', 'version', 'count', 'dir').
+    """
+    logger = logging.getLogger(__name__)
+    snapshot_root = snapshot_path(sqlite_db)
+    os.makedirs(snapshot_root, exist_ok=True)
+    conn = open_catalog(sqlite_db)
+    build_dir = os.path.join(snapshot_root, f'build-{os.getpid()}-{threading.get_ident()}')
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    try:
+        # Read the version and the rows in one transaction so they describe the same catalog state
+        conn.execute('BEGIN')
+        version = catalog_version(conn)
+        cursor = conn.execute(
+            'SELECT rowid, item_name, description, cost_price, category FROM items_master '
+            'WHERE is_active = 1 ORDER BY rowid'
+        )
+        blobs = {field: open(os.path.join(build_dir, f'{field}.utf8'), 'wb') for field in TEXT_FIELDS}
+        offsets = {field: array('q', [0]) for field in TEXT_FIELDS}
+        rowids, costs = array('q'), array('d')
+        try:
+            while True:
+                rows = cursor.fetchmany(BUILD_BATCH_SIZE)
+                if not rows:
+                    break
+                for rowid, item_name, description, cost_price, category in rows:
+                    rowids.append(rowid)
+                    costs.append(float(cost_price) if isinstance(cost_price, (int, float)) else float('nan'))
+                    item_name, description = str(item_name or ''), str(description or '')
+                    values = (item_name, description, str(category or ''),
+                              item_name.lower() + '\n', description.lower() + '\n')
+                    for field, value in zip(TEXT_FIELDS, values):
+                        data = value.encode('utf-8')
+                        blobs[field].write(data)
+                        offsets[field].append(offsets[field][-1] + len(data))
+        finally:
+            for f in blobs.values():
+                f.close()
+        conn.rollback()
+        np.frombuffer(rowids, dtype=np.int64).tofile(os.path.join(build_dir, 'rowids.i64'))
+        np.frombuffer(costs, dtype=np.float64).tofile(os.path.join(build_dir, 'costs.f64'))
+        for field in TEXT_FIELDS:
+            np.frombuffer(offsets[field], dtype=np.int64).tofile(os.path.join(build_dir, f'{field}.off'))
+        version_dir = f'v{version}'
+        try:
+            os.rename(build_dir, os.path.join(snapshot_root, version_dir))
+        except OSError:
+            # Another process already built this version
+            shutil.rmtree(build_dir, ignore_errors=True)
+        meta = {'format': SNAPSHOT_FORMAT, 'version': version, 'count': len(rowids), 'dir': version_dir}
+        tmp_path = os.path.join(snapshot_root, f'current.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(snapshot_root, 'current.json'))
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+    # Processes that still map an older snapshot keep reading it until they reload
+    for name in os.listdir(snapshot_root):
+        if name.startswith('v') and name != version_dir:
+            shutil.rmtree(os.path.join(snapshot_root, name), ignore_errors=True)
+    logger.info(f"Built catalog snapshot of {len(rowids)} items at catalog version {version}.")
+    return meta
+
+class CatalogSnapshot:
+    """
+    A read-only, memory-mapped catalog snapshot (see build_catalog_snapshot).
+    Arrays and text blobs are mapped, not read, so opening one is a few system calls and every process that
+    opens the same snapshot shares the same physical pages.
+    """
+
+    def __init__(self, snapshot_dir: str, meta: dict):
+        self.version = meta['version']
+        self.count = meta['count']
+        self._files = []
+        self.rowids = self._array(snapshot_dir, 'rowids.i64', np.int64, self.count)
+        self.costs = self._array(snapshot_dir, 'costs.f64', np.float64, self.count)
+        self.offsets, self.blobs = {}, {}
+        for field in TEXT_FIELDS:
+            self.offsets[field] = self._array(snapshot_dir, f'{field}.off', np.int64, self.count + 1)
+            self.blobs[field] = self._map(os.path.join(snapshot_dir, f'{field}.utf8'))
+
+    def _array(self, snapshot_dir, name, dtype, count):
+        if not count:
+            return np.zeros(count, dtype=dtype)
+        return np.memmap(os.path.join(snapshot_dir, name), dtype=dtype, mode='r', shape=(count,))
+
+    def _map(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(blob)
+        return blob
+
+    def __len__(self):
+        return self.count
+
+    def text(self, field: str, index: int) -> str:
+        """
+        Returns the text of one row of a text field.
+        """
+        offsets = self.offsets[field]
+        return self.blobs[field][int(offsets[index]):int(offsets[index + 1])].decode('utf-8')
+
+    def rows_containing(self, field: str, term: str):
+        """
+        Returns the sorted indexes of the rows whose lowercased field contains term as a substring.
+        The whole column is scanned as one blob, so the cost is a byte search plus one step per hit.
+        """
+        blob, needle = self.blobs[field], term.lower().encode('utf-8')
+        if not needle or not blob:
+            return np.zeros(0, dtype=np.int64)
+        positions, start = array('q'), 0
+        while True:
+            position = blob.find(needle, start)
+            if position < 0:
+                break
+            positions.append(position)
+            start = position + 1
+        if not positions:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.searchsorted(self.offsets[field], np.frombuffer(positions, dtype=np.int64), side='right') - 1
+        return np.unique(rows)
+
+    def close(self):
+        """
+        Unmaps the text blobs.
+        """
+        for blob in self._files:
+            blob.close()
+        self._files = []
+
+def load_catalog_snapshot(sqlite_db: str, conn=None) -> CatalogSnapshot:
+    """
+    Returns the catalog snapshot of a database. Only maps an existing snapshot and never writes; snapshots are
+    built by refresh_catalog_snapshot (called by the service at start-up and by the loader and ingest).
+    The open snapshot is kept per database, so repeated calls cost one version lookup.
+    conn is an open connection to the database used for that lookup; without one a short-lived one is opened.
+    Raises RuntimeError if the database has no snapshot or the catalog changed since it was built.
+    """
+    path = os.path.abspath(sqlite_db)
+    if conn is None:
+        version_conn = open_catalog(sqlite_db)
+        try:
+            version = catalog_version(version_conn)
+        finally:
+            version_conn.close()
+    else:
+        version = catalog_version(conn)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        snapshot_root = snapshot_path(sqlite_db)
+        meta = _read_current(snapshot_root)
+        if meta is None or meta.get('format') != SNAPSHOT_FORMAT:
+            raise RuntimeError(f"No catalog snapshot for {sqlite_db}; build it with "
+                               f"'python -m modules.snapshot --db {sqlite_db}'.")
+        if meta['version'] != version:
+            raise RuntimeError(f"The catalog snapshot of {sqlite_db} is stale (built at catalog version "
+                               f"{meta['version']}, catalog is at {version}); refresh it with "
+                               f"'python -m modules.snapshot --db {sqlite_db}'.")
+        snapshot = CatalogSnapshot(os.path.join(snapshot_root, meta['dir']), meta)
+        # The previous snapshot may still be in use by another thread; its mappings are released once unreferenced
+        _snapshots[path] = snapshot
+        return snapshot
+
+def refresh_catalog_snapshot(sqlite_db: str, create: bool = False):
+    """
+    Rebuilds the catalog snapshot of a database after a catalog change, if the database has one.
+    With create, a database without a snapshot gets one built.
+    Returns the new snapshot metadata, or None if nothing was built (no snapshot, or it is already current).
+    """
+    meta = _read_current(snapshot_path(sqlite_db))
+    if meta is None:
+        return build_catalog_snapshot(sqlite_db) if create else None
+    conn = open_catalog(sqlite_db)
+    try:
+        version = catalog_version(conn)
+    finally:
+        conn.close()
+    if meta.get('format') == SNAPSHOT_FORMAT and meta['version'] == version:
+        return None
+    return build_catalog_snapshot(sqlite_db)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or bring up to date the catalog snapshot of a database.")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if not os.path.exists(args.db):
+        print(f"Error: Database file not found: {args.db}")
+        return
+    refresh_catalog_snapshot(args.db, create=True)
+    print(f"Catalog snapshot of {args.db} is up to date.")
+
+if __name__ == "__main__":
+    main()
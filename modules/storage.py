@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import logging
+from urllib.parse import quote
+from modules.search_index import ensure_search_index, ensure_search_vocabulary, ensure_vocabulary_version
+from modules.catalog import make_item_key, upsert_catalog_rows, ensure_catalog_version
+from modules.pricing import ensure_pricing_rules_table
+from modules.metrics import stage_timer
+
+# Connection settings applied by configure_connection
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 32 * 1024
+
+CATALOG_COLUMNS = ('id', 'item_key', 'item_name', 'description', 'cost_price', 'category', 'content_hash',
+                   'is_active', 'source')
+CATALOG_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS items_master (
+        id INTEGER PRIMARY KEY,
+        item_key TEXT,
+        item_name TEXT,
+        description TEXT,
+        cost_price REAL,
+        category TEXT,
+        content_hash TEXT,
+        is_active INTEGER NOT NULL DEFAULT 1,
+        source TEXT
+    )
+'''
+
+def configure_connection(conn, readonly: bool = False):
+    """
+    Applies the connection settings every catalog connection uses.
+
+    Purpose:
+        - WAL journal (writable connections only; the mode is stored in the database file), so readers never
+          block the writer or each other.
+        - synchronous=NORMAL: safe with WAL, and commits no longer wait for an fsync.
+        - A memory-mapped read path (mmap_size) and a larger page cache (cache_size).
+        - A busy timeout, so concurrent writers wait for the lock instead of failing at once.
+
+    Returns:
+        sqlite3.Connection: The same connection, for chaining.
+    """
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    if not readonly:
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def open_catalog(sqlite_db: str, readonly: bool = False, check_same_thread: bool = True):
+    """
+    Opens a configured connection to a catalog database.
+    Writable connections also bring the schema up to date (see migrate_schema); read-only connections require
+    an existing database and cannot migrate it.
+    Raises RuntimeError if a read-only database does not exist.
+    """
+    with stage_timer('connect'):
+        if readonly:
+            path = os.path.abspath(sqlite_db)
+            if not os.path.exists(path):
+                raise RuntimeError(f"Database file not found: {sqlite_db}")
+            conn = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True, check_same_thread=check_same_thread)
+            conn.execute('PRAGMA query_only = ON')
+            return configure_connection(conn, readonly=True)
+        conn = sqlite3.connect(sqlite_db, check_same_thread=check_same_thread)
+        configure_connection(conn)
+        migrate_schema(conn)
+        return conn
+
+def migrate_canonical_catalog(conn):
+    """
+    Migration 1: makes 'items_master' the canonical catalog table, with an integer primary key and the catalog
+    sync columns.
+    Older tables (no primary key, or missing columns) are rebuilt with the same rowids, so the full-text index
+    and the embedding store stay valid, and rows without an item key get one (see backfill_item_keys).
+    Raises RuntimeError for tables created with custom column names, which cannot be mapped automatically.
+    """
+    logger = logging.getLogger(__name__)
+    cursor = conn.cursor()
+    columns = {row[1]: row for row in cursor.execute('PRAGMA table_info(items_master)')}
+    if not columns:
+        cursor.execute(CATALOG_TABLE_SQL)
+    elif set(CATALOG_COLUMNS) - set(columns) or columns['id'][5] != 1 or columns['id'][2].upper() != 'INTEGER':
+        missing = {'item_name', 'description', 'cost_price'} - set(columns)
+        if missing:
+            raise RuntimeError(
+                f"Cannot migrate 'items_master': columns {sorted(missing)} are missing (custom column names are "
+                "not supported; map source columns when loading instead)."
+            )
+        logger.info("Rebuilding 'items_master' with a primary key and the catalog sync columns.")
+        copied = [col for col in CATALOG_COLUMNS if col in columns and col != 'id']
+        cursor.execute('DROP TABLE IF EXISTS items_master_migrated')
+        cursor.execute(CATALOG_TABLE_SQL.replace('items_master', 'items_master_migrated', 1))
+        cursor.execute(
+            f"INSERT INTO items_master_migrated (id, {', '.join(copied)}) "
+            f"SELECT rowid, {', '.join(copied)} FROM items_master"
+        )
+        # Dropping the old table also drops its indexes and triggers; later migrations recreate what is needed
+        cursor.execute('DROP TABLE items_master')
+        cursor.execute('ALTER TABLE items_master_migrated RENAME TO items_master')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_items_master_item_key ON items_master(item_key)')
+    backfill_item_keys(cursor)
+    # An 'items_fts' index from before the rebuild needs its triggers back before any row changes
+    ensure_search_index(conn)
+    ensure_catalog_version(conn)
+
+def backfill_item_keys(cursor):
+    """
+    Gives catalog rows without an item key the key of their name.
+    Rows whose key is already taken (e.g. sample data inserted twice before items had keys) are duplicates:
+    the row with the lowest rowid keeps the key and the others are soft-deleted, so matching returns the item
+    once and catalog sync, which finds rows by key, can update or remove it. Rows without a usable name stay
+    without a key.
+    Returns the number of duplicates soft-deleted.
+    """
+    logger = logging.getLogger(__name__)
+    taken = {key for (key,) in cursor.execute('SELECT item_key FROM items_master WHERE item_key IS NOT NULL')}
+    keys, duplicates = [], []
+    for rowid, name in cursor.execute(
+            'SELECT id, item_name FROM items_master WHERE item_key IS NULL ORDER BY id').fetchall():
+        key = make_item_key(name)
+        if key is None:
+            continue
+        if key in taken:
+            duplicates.append((rowid,))
+        else:
+            taken.add(key)
+            keys.append((key, rowid))
+    cursor.executemany('UPDATE items_master SET item_key = ? WHERE id = ?', keys)
+    cursor.executemany('UPDATE items_master SET is_active = 0 WHERE id = ?', duplicates)
+    if duplicates:
+        logger.warning(f"Soft-deleted {len(duplicates)} duplicate catalog rows whose item key an older row has.")
+    return len(duplicates)
+
+def migrate_legacy_items(conn):
+    """
+    Migration 2: moves rows the old loader wrote to the separate 'items' table into 'items_master' (keyed by
+    normalised item name, last row wins) and drops 'items'.
+    """
+    logger = logging.getLogger(__name__)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items'")
+    if not cursor.fetchone():
+        return
+    rows = [
+        (make_item_key(name), name, description, cost_price, None)
+        for name, description, cost_price in cursor.execute(
+            'SELECT item_name, description, cost_price FROM items ORDER BY rowid')
+        if make_item_key(name) is not None
+    ]
+    counts = upsert_catalog_rows(cursor, rows) if rows else {'inserted': 0, 'updated': 0}
+    cursor.execute('DROP TABLE items')
+    logger.info(f"Moved legacy 'items' rows into 'items_master': {counts['inserted']} inserted, "
+                f"{counts['updated']} updated.")
+
+def migrate_pricing_rules(conn):
+    """
+    Migration 3: creates the pricing rules table and its version triggers.
+    """
+    ensure_pricing_rules_table(conn)
+
+def migrate_catalog_indexes(conn):
+    """
+    Migration 4: replaces B-tree indexes on free text, which keyword and substring matching cannot use, with
+    indexes for the structured filters: category with cost (category rules and browsing a category by price)
+    and cost alone (cost bands and price-range queries).
+    """
+    cursor = conn.cursor()
+    cursor.execute('DROP INDEX IF EXISTS idx_items_master_item_name')
+    cursor.execute('DROP INDEX IF EXISTS idx_items_master_description')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_master_category_cost ON items_master(category, cost_price)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_master_cost ON items_master(cost_price)')
+
+def migrate_search_vocabulary(conn):
+    """
+    Migration 5: exposes the vocabulary of the full-text index, from which fuzzy matching builds its trigram
+    index.
+    """
+    ensure_search_vocabulary(conn)
+
+def migrate_catalog_sources(conn):
+    """
+    Migration 6: adds the 'source' column naming the supplier price list a row was synced from to catalogs
+    created before it was part of the table, with an index so a sync can soft-delete within its own source.
+    Existing rows have no source.
+    """
+    cursor = conn.cursor()
+    if 'source' not in {row[1] for row in cursor.execute('PRAGMA table_info(items_master)')}:
+        cursor.execute('ALTER TABLE items_master ADD COLUMN source TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_master_source ON items_master(source)')
+
+def migrate_vocabulary_version(conn):
+    """
+    Migration 7: adds the vocabulary version counter, so fuzzy matching re-reads the vocabulary only after
+    catalog text changed rather than after every catalog write.
+    """
+    ensure_vocabulary_version(conn)
+
+# Applied in order; PRAGMA user_version records how many have run
+SCHEMA_MIGRATIONS = (migrate_canonical_catalog, migrate_legacy_items, migrate_pricing_rules, migrate_catalog_indexes,
+                     migrate_search_vocabulary, migrate_catalog_sources, migrate_vocabulary_version)
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+def schema_version(conn) -> int:
+    """
+    Returns the schema version of a database (the number of migrations applied).
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_schema(conn) -> int:
+    """
+    Brings a database up to SCHEMA_VERSION by applying the migrations it has not run yet, committing after
+    each one. Every migration is idempotent, so a database prepared by an older version of the code (without a
+    schema version) is migrated safely. Costs one PRAGMA read when the schema is current.
+    Returns the schema version.
+    """
+    logger = logging.getLogger(__name__)
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        SCHEMA_MIGRATIONS[number - 1](conn)
+        conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+    logger.info(f"Migrated database schema from version {version} to {SCHEMA_VERSION}.")
+    return SCHEMA_VERSION
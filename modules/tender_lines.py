@@ -0,0 +1,136 @@
+import os
+import re
+import sys
+import logging
+import argparse
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.loader import DEFAULT_CHUNK_SIZE, open_sheet_stream, resolve_column_mapping
+
+# Fields mapped from the columns of an uploaded tender sheet
+TENDER_LINE_COLUMNS = ('Description', 'Quantity')
+UNITS = r'(?:nos?|pcs?|units?|sets?)\.?'
+QUANTITY = r'(?P<quantity>\d+(?:\.\d+)?)'
+# Units of a specification number ("2 MP camera", "8 channel NVR"), which is never read as a quantity
+SPEC_UNITS = r'(?:mp|megapixels?|inch(?:es)?|in|mm|cm|m|kg|g|v|w|gb|tb|ch|channels?|ports?|core)\b'
+# Tried in order: "50 x outdoor camera", "50 nos camera", "12 door sensor", "door sensor x 12",
+# "door sensor - qty: 12", "door sensor - 12 nos". Without a marker, only a whole number not followed by a
+# specification unit counts as a quantity.
+LINE_PATTERNS = [
+    re.compile(rf'^{QUANTITY}\s*(?:[x×*]|{UNITS})\s+(?P<requirements>.+)$', re.IGNORECASE),
+    re.compile(rf'^(?P<quantity>\d+)\s+(?!{SPEC_UNITS})(?P<requirements>.+)$', re.IGNORECASE),
+    re.compile(rf'^(?P<requirements>.+?)(?:\s+|\s*[-–:,]\s*)(?:[x×*]|qty\.?\s*:?)\s*{QUANTITY}\s*(?:{UNITS})?$',
+               re.IGNORECASE),
+    re.compile(rf'^(?P<requirements>.+?)(?:\s+|\s*[-–:,]\s*){QUANTITY}\s*{UNITS}$', re.IGNORECASE),
+]
+# List markers in front of a line ("-", "•", "3.", "3)"); a bare number is a quantity, not a marker
+LIST_MARKER = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+
+def parse_quantity(value):
+    """
+    Converts a quantity to an int when it is whole, else a float. Returns None if it is not a positive number.
+    """
+    quantity = pd.to_numeric(value, errors='coerce')
+    if pd.isna(quantity) or quantity <= 0:
+        return None
+    return int(quantity) if float(quantity).is_integer() else float(quantity)
+
+def parse_line_item(text: str):
+    """
+    Splits one tender line into its requirements and quantity (1 when none is given).
+    Returns a (requirements, quantity) tuple, or None for a blank line or a zero quantity.
+    """
+    text = LIST_MARKER.sub('', text).strip()
+    if not text:
+        return None
+    for pattern in LINE_PATTERNS:
+        match = pattern.match(text)
+        if match and match.group('requirements').strip():
+            quantity = parse_quantity(match.group('quantity'))
+            return None if quantity is None else (match.group('requirements').strip(), quantity)
+    return text, 1
+
+def parse_line_items(requirements: str):
+    """
+    Parses free-text tender requirements into line items, one per line (or per ';'-separated part).
+    Returns a list of dicts with 'line' (position in the text), 'requirements' and 'quantity'.
+    """
+    lines = []
+    for part in re.split(r'[\n;]', requirements or ''):
+        parsed = parse_line_item(part)
+        if parsed:
+            lines.append({'line': len(lines) + 1, 'requirements': parsed[0], 'quantity': parsed[1]})
+    return lines
+
+def load_line_items(data_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Reads the line items of an uploaded tender sheet (Excel, CSV or Parquet).
+    The 'Description' and 'Quantity' columns are mapped like price-list columns: exact or fuzzy name matching,
+    prompting for any not found. Rows without a description are skipped; a missing quantity counts as 1.
+    Returns a list of dicts with 'line' (the spreadsheet row number), 'requirements' and 'quantity'.
+    """
+    logger = logging.getLogger(__name__)
+    columns, chunks = open_sheet_stream(data_file, chunk_size)
+    mapping = resolve_column_mapping(columns, TENDER_LINE_COLUMNS, ())
+    lines, skipped = [], 0
+    # Excel row numbers: the header is row 1, so data starts at row 2
+    first_row = 2
+    for chunk in chunks:
+        descriptions = chunk[mapping['Description']].to_numpy(dtype=object)
+        quantities = chunk[mapping['Quantity']].to_numpy(dtype=object)
+        for offset, (description, quantity) in enumerate(zip(descriptions, quantities)):
+            description = '' if pd.isna(description) else str(description).strip()
+            quantity = 1 if pd.isna(quantity) or quantity == '' else parse_quantity(quantity)
+            if not description or quantity is None:
+                skipped += 1
+                continue
+            lines.append({'line': first_row + offset, 'requirements': description, 'quantity': quantity})
+        first_row += len(chunk)
+    if skipped:
+        logger.warning(f"Skipped {skipped} tender rows without a description or with an invalid quantity.")
+    return lines
+
+def line_item_rows(recommended_lines):
+    """
+    Flattens recommend_line_items results into the per-line rows generate_tender_excel writes: each
+    recommended item gets its line's 'line', 'requirements' and 'quantity' and its 'option' rank (1 = best).
+    A line without matches yields a single row without an item, so the workbook still lists it.
+    """
+    for line in recommended_lines:
+        header = {'line': line['line'], 'requirements': line['requirements'], 'quantity': line['quantity']}
+        if not line['items']:
+            yield dict(header, option=None, item_name=None, description=None, cost_price=None,
+                       suggested_selling_price=None, profit_margin_percent=None)
+        for option, item in enumerate(line['items'], 1):
+            yield dict(header, option=option, **item)
+
+def main(argv=None):
+    from modules.matcher import DEFAULT_LINE_TOP_K, recommend_line_items
+    from modules.generator import generate_tender_excel
+    parser = argparse.ArgumentParser(description="Recommend catalog items for every line item of a tender.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('tender_file', nargs='?', help="Tender sheet with Description and Quantity columns")
+    source.add_argument('--text', help="Line items as text, one per line or ';'-separated (e.g. '50 x camera')")
+    parser.add_argument('--margin', type=float, required=True, help="Desired profit margin percentage")
+    parser.add_argument('--db', default=os.path.join('db', 'items.db'), help="SQLite database path")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_LINE_TOP_K, help="Items recommended per line")
+    parser.add_argument('--fuzzy', action='store_true', help="Correct misspelt requirement keywords")
+    parser.add_argument('--output', default=os.path.join('data', 'Tender_Output.xlsx'), help="Workbook to write")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    lines = load_line_items(args.tender_file) if args.tender_file else parse_line_items(args.text)
+    recommended = recommend_line_items(args.db, lines, args.margin, top_k=args.top_k, fuzzy=args.fuzzy)
+    if isinstance(recommended, str):
+        print(f"Error: {recommended}")
+        return
+    matched = sum(1 for line in recommended if line['items'])
+    print(f"{matched} of {len(recommended)} line items matched.")
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    if generate_tender_excel(line_item_rows(recommended), args.output):
+        print(f"Tender document saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
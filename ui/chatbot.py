@@ -1,11 +1,12 @@
 import sys
 import os
+import logging
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from modules.matcher import recommend_items_for_tender
-from modules.generator import generate_tender_excel
+from modules.service_client import SERVICE_URL_ENV, call_tender_service
 
 def main():
+    logging.basicConfig(level=logging.INFO)
     print("=== Tender Recommendation System ===")
     requirements = input("Enter tender requirements (keywords, specs, etc.): ").strip()
     if not requirements:
@@ -16,6 +17,20 @@ def main():
     except ValueError:
         print("Invalid profit margin. Exiting.")
         return
+    service_url = os.environ.get(SERVICE_URL_ENV)
+    if service_url:
+        # A running tender service already has the catalog warm, so skip loading it here
+        try:
+            result = call_tender_service(service_url, '/generate',
+                                         {'requirements': requirements, 'margin': profit_margin})
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return
+        print(f"{result['items']} items recommended.")
+        print(f"Tender document saved to {result['output_file']}")
+        return
+    from modules.matcher import recommend_items_for_tender
+    from modules.generator import generate_tender_excel
     db_path = os.path.join('db', 'items.db')
     recommended_items = recommend_items_for_tender(db_path, requirements, profit_margin)
     if isinstance(recommended_items, str):